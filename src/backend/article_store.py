@@ -0,0 +1,282 @@
+"""
+Local Wikipedia article store
+Persists fetched articles in SQLite with an FTS5 index over titles and
+extracts so Earth World searches can be answered without en.wikipedia.org
+"""
+
+import html
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+
+ARTICLE_DB_PATH = os.getenv("ARTICLE_DB_PATH", "data/wikipedia_articles.db")
+
+# Total extract bytes kept before least-recently-used articles are evicted
+ARTICLE_STORE_MAX_BYTES = int(os.getenv("ARTICLE_STORE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Local search results older than this are not trusted without going upstream;
+# dump-loaded articles are a fixed snapshot and stay searchable until re-ingested
+ARTICLE_STORE_MAX_AGE = 7 * 24 * 60 * 60  # seconds
+
+SOURCE_API = "api"
+SOURCE_DUMP = "dump"
+
+# snippet() marks matches with these so the text can be escaped before the spans go in
+_MATCH_START = "\x02"
+_MATCH_END = "\x03"
+
+
+def get_connection():
+    """Get article store connection."""
+    os.makedirs(os.path.dirname(ARTICLE_DB_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(ARTICLE_DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _fts5_available() -> bool:
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(body)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+FTS5_AVAILABLE = _fts5_available()
+
+
+def init_article_store():
+    """Initialize article tables, full-text index and sync triggers."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS articles (
+            pageid INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            extract TEXT NOT NULL DEFAULT '',
+            thumbnail TEXT,
+            categories TEXT DEFAULT '[]',
+            related_pages TEXT DEFAULT '[]',
+            revid INTEGER DEFAULT 0,
+            full_text INTEGER DEFAULT 1,
+            size INTEGER DEFAULT 0,
+            fetched_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            source TEXT NOT NULL DEFAULT 'api'
+        )
+    ''')
+    cursor.execute('PRAGMA table_info(articles)')
+    if 'source' not in {row['name'] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE articles ADD COLUMN source TEXT NOT NULL DEFAULT 'api'")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_last_access ON articles (last_access)')
+
+    # Running total of article sizes, kept by triggers so eviction checks don't scan the table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_store_size (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            bytes INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO article_store_size (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM articles')
+    cursor.executescript('''
+        CREATE TRIGGER IF NOT EXISTS articles_size_ai AFTER INSERT ON articles BEGIN
+            UPDATE article_store_size SET bytes = bytes + new.size WHERE id = 0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS articles_size_ad AFTER DELETE ON articles BEGIN
+            UPDATE article_store_size SET bytes = bytes - old.size WHERE id = 0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS articles_size_au AFTER UPDATE OF size ON articles BEGIN
+            UPDATE article_store_size SET bytes = bytes - old.size + new.size WHERE id = 0;
+        END;
+    ''')
+
+    if FTS5_AVAILABLE:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                title, extract,
+                content='articles', content_rowid='pageid',
+                tokenize='porter unicode61'
+            )
+        ''')
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+                INSERT INTO articles_fts (rowid, title, extract) VALUES (new.pageid, new.title, new.extract);
+            END;
+            CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+                INSERT INTO articles_fts (articles_fts, rowid, title, extract)
+                VALUES ('delete', old.pageid, old.title, old.extract);
+            END;
+            CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE OF title, extract ON articles BEGIN
+                INSERT INTO articles_fts (articles_fts, rowid, title, extract)
+                VALUES ('delete', old.pageid, old.title, old.extract);
+                INSERT INTO articles_fts (rowid, title, extract) VALUES (new.pageid, new.title, new.extract);
+            END;
+        ''')
+
+    conn.commit()
+    conn.close()
+
+
+def _highlight(snippet: str) -> str:
+    escaped = html.escape(snippet, quote=False)
+    return escaped.replace(_MATCH_START, '<span class="searchmatch">').replace(_MATCH_END, '</span>')
+
+
+class ArticleStore:
+    """Database operations for stored Wikipedia articles."""
+
+    @staticmethod
+    def upsert_many(articles: Iterable[Dict], conn: Optional[sqlite3.Connection] = None):
+        """Insert or replace articles (dicts with pageid, title, extract, ...) in one transaction.
+
+        full_text=False marks intro-only extracts, which are searchable but
+        not served as complete articles; source="dump" marks articles loaded
+        from a dump, which search serves regardless of age.
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        now = time.time()
+        rows = [
+            (
+                a["pageid"], a["title"], a.get("extract", ""), a.get("thumbnail"),
+                json.dumps(a.get("categories", [])), json.dumps(a.get("related_pages", [])),
+                a.get("revid", 0), int(a.get("full_text", True)), len(a.get("extract", "").encode()), now, now,
+                a.get("source", SOURCE_API),
+            )
+            for a in articles
+        ]
+        conn.executemany('''
+            INSERT INTO articles (pageid, title, extract, thumbnail, categories, related_pages,
+                                  revid, full_text, size, fetched_at, last_access, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(pageid) DO UPDATE SET
+                title = excluded.title,
+                extract = excluded.extract,
+                thumbnail = COALESCE(excluded.thumbnail, thumbnail),
+                categories = excluded.categories,
+                related_pages = excluded.related_pages,
+                revid = excluded.revid,
+                full_text = excluded.full_text,
+                size = excluded.size,
+                fetched_at = excluded.fetched_at,
+                source = excluded.source
+        ''', rows)
+        conn.commit()
+        if own_conn:
+            ArticleStore.evict(conn)
+            conn.close()
+
+    @staticmethod
+    def upsert(article: Dict):
+        ArticleStore.upsert_many([article])
+
+    @staticmethod
+    def get(pageid: int) -> Optional[Dict]:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM articles WHERE pageid = ?', (pageid,))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute('UPDATE articles SET last_access = ? WHERE pageid = ?', (time.time(), pageid))
+            conn.commit()
+        conn.close()
+        if not row:
+            return None
+        article = dict(row)
+        article["categories"] = json.loads(article["categories"])
+        article["related_pages"] = json.loads(article["related_pages"])
+        return article
+
+    @staticmethod
+    def missing(pageids: List[int]) -> List[int]:
+        """Page IDs from the list that are not stored yet."""
+        if not pageids:
+            return []
+        conn = get_connection()
+        cursor = conn.cursor()
+        placeholders = ", ".join("?" for _ in pageids)
+        cursor.execute(f'SELECT pageid FROM articles WHERE pageid IN ({placeholders})', list(pageids))
+        stored = {row['pageid'] for row in cursor.fetchall()}
+        conn.close()
+        return [pageid for pageid in pageids if pageid not in stored]
+
+    @staticmethod
+    def search(query: str, limit: int = 10, max_age: float = ARTICLE_STORE_MAX_AGE) -> List[Dict]:
+        """Ranked full-text search with highlighted snippets (fresh or dump-loaded articles only).
+
+        Snippets are HTML like the Wikipedia API's: the text is escaped and
+        matches are wrapped in <span class="searchmatch">.
+        """
+        if not FTS5_AVAILABLE or not query.strip():
+            return []
+
+        # Quote each term so user input can't be parsed as FTS5 syntax
+        match = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT a.pageid, a.title, a.thumbnail,
+                       snippet(articles_fts, 1, ?, ?, '...', 24) AS snippet
+                FROM articles_fts
+                JOIN articles a ON a.pageid = articles_fts.rowid
+                WHERE articles_fts MATCH ? AND (a.fetched_at >= ? OR a.source = ?)
+                ORDER BY bm25(articles_fts, 10.0, 1.0)
+                LIMIT ?
+            ''', (_MATCH_START, _MATCH_END, match, time.time() - max_age, SOURCE_DUMP, limit))
+            rows = [dict(row) for row in cursor.fetchall()]
+            for row in rows:
+                row["snippet"] = _highlight(row["snippet"])
+        except sqlite3.OperationalError:
+            rows = []
+
+        if rows:
+            now = time.time()
+            cursor.executemany(
+                'UPDATE articles SET last_access = ? WHERE pageid = ?',
+                [(now, row["pageid"]) for row in rows]
+            )
+            conn.commit()
+        conn.close()
+        return rows
+
+    @staticmethod
+    def evict(conn: sqlite3.Connection, max_bytes: int = ARTICLE_STORE_MAX_BYTES):
+        """Drop least-recently-accessed articles until the store is under 90% of its budget."""
+        cursor = conn.cursor()
+        cursor.execute('SELECT bytes FROM article_store_size WHERE id = 0')
+        total = cursor.fetchone()[0]
+        if total <= max_bytes:
+            return
+
+        target = int(max_bytes * 0.9)
+        cursor.execute('SELECT pageid, size FROM articles ORDER BY last_access ASC')
+        doomed = []
+        for pageid, size in cursor.fetchall():
+            if total <= target:
+                break
+            doomed.append((pageid,))
+            total -= size
+        cursor.executemany('DELETE FROM articles WHERE pageid = ?', doomed)
+        conn.commit()
+
+    @staticmethod
+    def stats() -> Dict:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM articles')
+        count, size = cursor.fetchone()
+        conn.close()
+        return {
+            "articles": count,
+            "bytes": size,
+            "max_bytes": ARTICLE_STORE_MAX_BYTES,
+            "fts5": FTS5_AVAILABLE,
+        }
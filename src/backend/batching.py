@@ -0,0 +1,83 @@
+"""
+Micro-batching for upstream calls
+Collects concurrent submissions that share a key for a few milliseconds and
+runs them through one batched handler call
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+BatchHandler = Callable[[Hashable, List[Any]], Awaitable[List[Any]]]
+
+
+class MicroBatcher:
+    """Coalesces concurrent submit() calls into batched handler calls."""
+
+    def __init__(self, handler: BatchHandler, max_batch_size: int = 16, max_wait: float = 0.01):
+        self._handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self.items_submitted = 0
+        self.batches_sent = 0
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """Queue an item under key and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((item, future))
+        self.items_submitted += 1
+
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: Hashable):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        # Waiters cancelled while queued don't need a slot in the upstream call
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if batch:
+            self.batches_sent += 1
+            asyncio.ensure_future(self._run(key, batch))
+
+    async def _run(self, key: Hashable, batch: List[Tuple[Any, asyncio.Future]]):
+        try:
+            results = await self._handler(key, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if len(results) != len(batch):
+            error = RuntimeError(f"Batch handler returned {len(results)} results for {len(batch)} items")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        # A handler can fail single items by returning an exception in their slot
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "items_submitted": self.items_submitted,
+            "batches_sent": self.batches_sent,
+            "avg_batch_size": round(self.items_submitted / self.batches_sent, 2) if self.batches_sent else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
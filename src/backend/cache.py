@@ -0,0 +1,66 @@
+"""
+In-process caches for upstream data
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries go stale after a TTL.
+
+    Stale entries are kept (until evicted) so callers can revalidate them or
+    serve them while refreshing.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """Return (value, is_fresh), or None if the key is absent."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        value, expires = entry
+        fresh = time.monotonic() < expires
+        if fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value, fresh
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value only if it is still fresh."""
+        entry = self.get_entry(key)
+        if entry is None or not entry[1]:
+            return None
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,141 @@
+"""
+Record/replay layer for upstream requests
+Stores upstream responses on disk keyed by a request fingerprint so the
+proxy routers can run offline and load tests can replay realistic payloads
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+REPLAY_OR_LIVE = "replay-or-live"
+MODES = {LIVE, RECORD, REPLAY, REPLAY_OR_LIVE}
+
+UPSTREAM_MODE = os.getenv("UPSTREAM_MODE", LIVE)
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", "data/cassettes")
+REPLAY_LATENCY_MS = float(os.getenv("REPLAY_LATENCY_MS", "0"))
+
+# Credentials are left out of fingerprints and never written to disk
+SECRET_PARAMS = {"api_key", "key", "token"}
+
+# Only the headers needed to decode the stored body are kept
+KEPT_HEADERS = {"content-type", "etag", "last-modified", "cache-control"}
+
+
+class CassetteMiss(httpx.TransportError):
+    """Raised in replay mode when no recording matches a request."""
+
+
+def fingerprint(request: httpx.Request) -> str:
+    """Stable key from method, host, path, sorted params (minus secrets) and body."""
+    params = sorted((k, v) for k, v in request.url.params.multi_items() if k not in SECRET_PARAMS)
+    parts = [
+        request.method,
+        request.url.host,
+        request.url.path,
+        json.dumps(params),
+        hashlib.sha256(request.content).hexdigest() if request.content else "",
+    ]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def _base_url(request: httpx.Request) -> str:
+    return f"{request.url.scheme}://{request.url.host}{request.url.path}"
+
+
+class CassetteStore:
+    """One JSON file per recorded response, with an in-memory read cache."""
+
+    def __init__(self, directory: str = CASSETTE_DIR):
+        self.directory = directory
+        self._cache: Dict[str, Tuple[int, Dict[str, str], bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def _path(self, host: str, key: str) -> str:
+        return os.path.join(self.directory, host, f"{key}.json")
+
+    def load(self, host: str, key: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        entry = self._cache.get(key)
+        if entry is not None:
+            return entry
+        path = self._path(host, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entry = (data["status"], data["headers"], base64.b64decode(data["body"]))
+        self._cache[key] = entry
+        return entry
+
+    def save(self, request: httpx.Request, key: str, status: int, headers: Dict[str, str], body: bytes):
+        path = self._path(request.url.host, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        params = {k: v for k, v in request.url.params.items() if k not in SECRET_PARAMS}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "method": request.method,
+                "url": _base_url(request),
+                "params": params,
+                "status": status,
+                "headers": headers,
+                "body": base64.b64encode(body).decode("ascii"),
+            }, f)
+        self._cache[key] = (status, headers, body)
+        self.recorded += 1
+
+    def stats(self) -> dict:
+        return {"directory": self.directory, "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Serves, records or passes through requests depending on the mode."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, store: CassetteStore, mode: str = UPSTREAM_MODE,
+                 replay_latency: float = REPLAY_LATENCY_MS / 1000):
+        if mode not in MODES:
+            raise ValueError(f"Unknown upstream mode '{mode}', expected one of {sorted(MODES)}")
+        self._transport = transport
+        self._store = store
+        self.mode = mode
+        self.replay_latency = replay_latency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        key = fingerprint(request)
+
+        if self.mode in (REPLAY, REPLAY_OR_LIVE):
+            entry = self._store.load(request.url.host, key)
+            if entry is not None:
+                self._store.hits += 1
+                if self.replay_latency > 0:
+                    await asyncio.sleep(self.replay_latency)
+                status, headers, body = entry
+                return httpx.Response(status, headers=headers, content=body, request=request)
+            self._store.misses += 1
+            if self.mode == REPLAY:
+                raise CassetteMiss(f"No recording for {request.method} {_base_url(request)}", request=request)
+
+        response = await self._transport.handle_async_request(request)
+        if self.mode == LIVE:
+            return response
+
+        # Record (and fill replay-or-live misses) with the decoded body
+        body = await response.aread()
+        await response.aclose()
+        headers = {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS}
+        if response.status_code < 500:
+            self._store.save(request, key, response.status_code, headers, body)
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self):
+        await self._transport.aclose()
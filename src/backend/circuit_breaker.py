@@ -0,0 +1,99 @@
+"""
+Circuit breaker for remote backends
+Tracks a rolling window of call outcomes and latencies, opens when the error
+rate crosses a threshold, and lets a single probe through after a cool-down
+"""
+
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Rolling error-rate breaker with half-open probing."""
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        slow_call: float = 5.0,
+        reset_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call  # calls slower than this count as failures
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (failed, latency)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        """Whether a remote call may be attempted right now."""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+
+        self.rejected += 1
+        return False
+
+    def record_success(self, latency: float):
+        if latency > self.slow_call:
+            self.record_failure(latency)
+            return
+        if self.state == HALF_OPEN:
+            self._close()
+            return
+        self._outcomes.append((False, latency))
+
+    def record_failure(self, latency: float):
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append((True, latency))
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+            if self._failure_rate() >= self.error_rate:
+                self._open()
+
+    def _failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for failed, _ in self._outcomes if failed) / len(self._outcomes)
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def _close(self):
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        latencies = [latency for _, latency in self._outcomes]
+        return {
+            "name": self.name,
+            "state": self.state,
+            "window_calls": len(self._outcomes),
+            "failure_rate": round(self._failure_rate(), 3),
+            "avg_latency_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "rejected": self.rejected,
+            "seconds_until_probe": (
+                max(0.0, round(self.reset_timeout - (time.monotonic() - self._opened_at), 1))
+                if self.state == OPEN else 0.0
+            ),
+        }
@@ -1,9 +1,14 @@
 import sqlite3
 import os
-from typing import Optional, List, Dict
+import json
+import time
+from typing import Optional, List, Dict, Tuple
 
 DATABASE_PATH = "data/infinity_explorer.db"
 
+# Number of recent messages that dominate the running emotion state
+EMOTION_WINDOW = int(os.getenv("EMOTION_WINDOW", "5"))
+
 
 def get_connection():
     """Get database connection."""
@@ -57,6 +62,82 @@ def init_db():
         )
     ''')
     
+    # Astronomy Picture of the Day, one row per publish date
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS apod (
+            date TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            explanation TEXT,
+            url TEXT,
+            hdurl TEXT,
+            media_type TEXT,
+            fetched_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Nominatim forward-geocode results keyed by normalized query
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            query TEXT PRIMARY KEY,
+            results TEXT NOT NULL,
+            result_limit INTEGER NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+    ''')
+    
+    # Nominatim reverse-geocode results keyed by geohash cell
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reverse_geocode_cache (
+            geohash TEXT PRIMARY KEY,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            result TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reverse_geocode_last_access
+        ON reverse_geocode_cache (last_access)
+    ''')
+    
+    # Running emotion state per character ('' world_id = across all worlds)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS emotion_state (
+            character_name TEXT NOT NULL,
+            world_id TEXT NOT NULL DEFAULT '',
+            scores TEXT NOT NULL DEFAULT '{}',
+            message_count INTEGER DEFAULT 0,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (character_name, world_id)
+        )
+    ''')
+    
+    # Notifications, shared by every worker process
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id TEXT PRIMARY KEY,
+            character_name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            title TEXT NOT NULL,
+            message TEXT NOT NULL,
+            icon TEXT,
+            color TEXT,
+            priority TEXT,
+            is_read INTEGER DEFAULT 0,
+            created_at TEXT NOT NULL,
+            data TEXT
+        )
+    ''')
+    # Covers unread counts and unread-first paging per character
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_notifications_character
+        ON notifications (character_name, is_read, created_at)
+    ''')
+    
+    # Readers in other workers don't block on writers
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     conn.commit()
     conn.close()
 
@@ -188,3 +269,377 @@ class MessageDB:
         rows = cursor.fetchall()
         conn.close()
         return [dict(row) for row in rows][::-1]
+
+
+class EmotionStateDB:
+    """Exponentially decayed emotion scores per character and world."""
+    
+    @staticmethod
+    def record(character_name: str, emotion: str, world_id: str = None, window: int = EMOTION_WINDOW):
+        """Fold one analyzed message into the overall and per-world state."""
+        alpha = 2 / (window + 1)
+        conn = get_connection()
+        cursor = conn.cursor()
+        scopes = ["", world_id] if world_id else [""]
+        try:
+            # Take the write lock before reading so concurrent workers can't interleave read-modify-write
+            cursor.execute('BEGIN IMMEDIATE')
+            for scope in scopes:
+                cursor.execute(
+                    'SELECT scores FROM emotion_state WHERE character_name = ? AND world_id = ?',
+                    (character_name, scope)
+                )
+                row = cursor.fetchone()
+                scores = json.loads(row['scores']) if row else {}
+
+                # Decay everything, drop negligible entries, then add the new message
+                scores = {k: round(v * (1 - alpha), 4) for k, v in scores.items()}
+                scores = {k: v for k, v in scores.items() if v >= 0.001}
+                scores[emotion] = round(scores.get(emotion, 0.0) + alpha, 4)
+
+                cursor.execute('''
+                    INSERT INTO emotion_state (character_name, world_id, scores, message_count)
+                    VALUES (?, ?, ?, 1)
+                    ON CONFLICT(character_name, world_id) DO UPDATE SET
+                        scores = excluded.scores,
+                        message_count = message_count + 1,
+                        updated_at = CURRENT_TIMESTAMP
+                ''', (character_name, scope, json.dumps(scores, separators=(",", ":"))))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def get(character_name: str) -> Dict[str, Dict]:
+        """Get state rows keyed by world_id ('' is the overall state)."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT world_id, scores, message_count FROM emotion_state WHERE character_name = ?',
+            (character_name,)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+        return {
+            row['world_id']: {"scores": json.loads(row['scores']), "message_count": row['message_count']}
+            for row in rows
+        }
+
+
+class ApodDB:
+    """Date-keyed store of Astronomy Pictures of the Day."""
+    
+    @staticmethod
+    def upsert_many(entries: List[Dict]):
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT OR REPLACE INTO apod (date, title, explanation, url, hdurl, media_type)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (e["date"], e.get("title", ""), e.get("explanation", ""), e.get("url", ""),
+             e.get("hdurl"), e.get("media_type", "image"))
+            for e in entries if e.get("date")
+        ])
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    def get(date: str) -> Optional[Dict]:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM apod WHERE date = ?', (date,))
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
+    
+    @staticmethod
+    def get_range(start_date: str, end_date: str) -> List[Dict]:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT * FROM apod WHERE date BETWEEN ? AND ? ORDER BY date',
+            (start_date, end_date)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+    
+    @staticmethod
+    def latest() -> Optional[Dict]:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM apod ORDER BY date DESC LIMIT 1')
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+
+class GeocodeCacheDB:
+    """Persistent cache of forward-geocode results."""
+    
+    @staticmethod
+    def get(query: str) -> Optional[Dict]:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM geocode_cache WHERE query = ?', (query,))
+        row = cursor.fetchone()
+        conn.close()
+        if not row:
+            return None
+        entry = dict(row)
+        entry["results"] = json.loads(entry["results"])
+        return entry
+    
+    @staticmethod
+    def put(query: str, results: List[Dict], result_limit: int):
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO geocode_cache (query, results, result_limit, fetched_at)
+            VALUES (?, ?, ?, ?)
+        ''', (query, json.dumps(results), result_limit, time.time()))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    def all_results() -> List[Dict]:
+        """Every cached result row, across all queries."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT results FROM geocode_cache')
+        rows = cursor.fetchall()
+        conn.close()
+        return [result for row in rows for result in json.loads(row['results'])]
+
+
+class ReverseGeocodeCacheDB:
+    """Persistent LRU cache of reverse-geocode results by geohash cell."""
+    
+    @staticmethod
+    def get_many(cells: List[str]) -> Dict[str, Dict]:
+        """Stored entries for any of the cells, marking them recently used."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        placeholders = ", ".join("?" for _ in cells)
+        cursor.execute(f'SELECT * FROM reverse_geocode_cache WHERE geohash IN ({placeholders})', cells)
+        rows = cursor.fetchall()
+        if rows:
+            cursor.executemany(
+                'UPDATE reverse_geocode_cache SET last_access = ? WHERE geohash = ?',
+                [(time.time(), row['geohash']) for row in rows]
+            )
+            conn.commit()
+        conn.close()
+        entries = {}
+        for row in rows:
+            entry = dict(row)
+            entry["result"] = json.loads(entry["result"])
+            entries[entry["geohash"]] = entry
+        return entries
+    
+    @staticmethod
+    def put(cell: str, lat: float, lon: float, result: Dict, max_entries: int):
+        """Store a result and evict least-recently-used cells beyond max_entries."""
+        now = time.time()
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO reverse_geocode_cache (geohash, lat, lon, result, fetched_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (cell, lat, lon, json.dumps(result), now, now))
+        cursor.execute('SELECT COUNT(*) FROM reverse_geocode_cache')
+        count = cursor.fetchone()[0]
+        if count > max_entries:
+            # Trim to 90% so eviction doesn't run on every insert
+            cursor.execute('''
+                DELETE FROM reverse_geocode_cache WHERE geohash IN (
+                    SELECT geohash FROM reverse_geocode_cache ORDER BY last_access ASC LIMIT ?
+                )
+            ''', (count - int(max_entries * 0.9),))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    def count() -> int:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM reverse_geocode_cache')
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
+
+
+class NotificationDB:
+    """Database operations for notifications."""
+    
+    @staticmethod
+    def _row_to_dict(row) -> Dict:
+        notification = dict(row)
+        notification["is_read"] = bool(notification["is_read"])
+        notification["data"] = json.loads(notification["data"]) if notification["data"] else None
+        return notification
+    
+    @staticmethod
+    def add_many(notifications: List[Dict]):
+        """Insert notifications in one transaction."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO notifications
+                (id, character_name, type, title, message, icon, color, priority, is_read, created_at, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                n["id"], n["character_name"], n["type"], n["title"], n["message"],
+                n.get("icon"), n.get("color"), n.get("priority"), int(n.get("is_read", False)),
+                n["created_at"], json.dumps(n["data"]) if n.get("data") is not None else None,
+            )
+            for n in notifications
+        ])
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    def get_page(character_name: str, limit: int = 20, offset: int = 0, unread_only: bool = False) -> List[Dict]:
+        conn = get_connection()
+        cursor = conn.cursor()
+        if unread_only:
+            cursor.execute('''
+                SELECT * FROM notifications
+                WHERE character_name = ? AND is_read = 0
+                ORDER BY created_at DESC LIMIT ? OFFSET ?
+            ''', (character_name, limit, offset))
+        else:
+            cursor.execute('''
+                SELECT * FROM notifications
+                WHERE character_name = ?
+                ORDER BY created_at DESC LIMIT ? OFFSET ?
+            ''', (character_name, limit, offset))
+        rows = cursor.fetchall()
+        conn.close()
+        return [NotificationDB._row_to_dict(row) for row in rows]
+    
+    @staticmethod
+    def get_inbox(character_name: str, limit: int) -> Tuple[List[Dict], int]:
+        """The newest notifications and the character's unread total, in one query."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT *, (
+                SELECT COUNT(*) FROM notifications WHERE character_name = ? AND is_read = 0
+            ) AS unread_total
+            FROM notifications
+            WHERE character_name = ?
+            ORDER BY created_at DESC LIMIT ?
+        ''', (character_name, character_name, limit))
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        # No rows means nothing unread either
+        unread_total = rows[0]["unread_total"] if rows else 0
+        for row in rows:
+            del row["unread_total"]
+        return [NotificationDB._row_to_dict(row) for row in rows], unread_total
+    
+    @staticmethod
+    def get_since(seq: int, character_name: str = None, limit: int = 500) -> List[Dict]:
+        """Notifications inserted after seq (their rowid), oldest first, with seq included."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        if character_name is None:
+            cursor.execute(
+                'SELECT rowid AS seq, * FROM notifications WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                (seq, limit)
+            )
+        else:
+            cursor.execute('''
+                SELECT rowid AS seq, * FROM notifications
+                WHERE character_name = ? AND rowid > ?
+                ORDER BY rowid LIMIT ?
+            ''', (character_name, seq, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        return [NotificationDB._row_to_dict(row) for row in rows]
+    
+    @staticmethod
+    def last_seq() -> int:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(MAX(rowid), 0) FROM notifications')
+        seq = cursor.fetchone()[0]
+        conn.close()
+        return seq
+    
+    @staticmethod
+    def unread_count(character_name: str) -> int:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT COUNT(*) FROM notifications WHERE character_name = ? AND is_read = 0',
+            (character_name,)
+        )
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
+    
+    @staticmethod
+    def mark_read(character_name: str, notification_id: str) -> bool:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE notifications SET is_read = 1 WHERE id = ? AND character_name = ?',
+            (notification_id, character_name)
+        )
+        updated = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return updated
+    
+    @staticmethod
+    def mark_all_read(character_name: str) -> int:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE notifications SET is_read = 1 WHERE character_name = ? AND is_read = 0',
+            (character_name,)
+        )
+        updated = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return updated
+    
+    @staticmethod
+    def clear(character_name: str, read_only: bool = False):
+        conn = get_connection()
+        cursor = conn.cursor()
+        if read_only:
+            cursor.execute('DELETE FROM notifications WHERE character_name = ? AND is_read = 1', (character_name,))
+        else:
+            cursor.execute('DELETE FROM notifications WHERE character_name = ?', (character_name,))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    def purge(older_than: str, max_per_character: int) -> int:
+        """Delete notifications created before older_than and all but the newest per character."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM notifications WHERE created_at < ?', (older_than,))
+        deleted = cursor.rowcount
+        cursor.execute('''
+            DELETE FROM notifications WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY character_name ORDER BY created_at DESC
+                    ) AS position
+                    FROM notifications
+                ) WHERE position > ?
+            )
+        ''', (max_per_character,))
+        deleted += cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
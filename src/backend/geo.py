@@ -0,0 +1,173 @@
+"""
+Geospatial helpers
+Geohash encoding, haversine distance and an in-process spatial index of
+places bucketed by geohash prefix
+"""
+
+import heapq
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 6) -> str:
+    """Standard base32 geohash of a coordinate."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """(lat, lon) size in degrees of a geohash cell."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def geohash_neighbors(lat: float, lon: float, precision: int) -> List[str]:
+    """The cell containing a coordinate followed by its (up to) eight neighbours."""
+    dlat, dlon = geohash_cell_size(precision)
+    cells = []
+    for i in (0, 1, -1):
+        for j in (0, 1, -1):
+            nlat = lat + i * dlat
+            if not -90.0 <= nlat <= 90.0:
+                continue
+            cell = geohash_encode(nlat, _wrap_lon(lon + j * dlon), precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def _wrap_lon(lon: float) -> float:
+    return (lon + 180.0) % 360.0 - 180.0
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """Places bucketed by geohash prefix, answering radius and k-nearest queries.
+
+    Each place is a dict with at least lat/lon (floats) and category; keys
+    are caller-chosen so re-adding a place replaces it.
+    """
+
+    def __init__(self, precision: int = 3):
+        self.precision = precision
+        self._cell_lat, self._cell_lon = geohash_cell_size(precision)
+        self._places: Dict[Hashable, dict] = {}
+        self._cell_of: Dict[Hashable, str] = {}
+        self._buckets: Dict[str, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._places
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        return self._places.get(key)
+
+    def add(self, key: Hashable, place: dict):
+        self.remove(key)
+        cell = geohash_encode(place["lat"], place["lon"], self.precision)
+        self._places[key] = place
+        self._cell_of[key] = cell
+        self._buckets.setdefault(cell, set()).add(key)
+
+    def remove(self, key: Hashable):
+        cell = self._cell_of.pop(key, None)
+        if cell is None:
+            return
+        del self._places[key]
+        bucket = self._buckets[cell]
+        bucket.discard(key)
+        if not bucket:
+            del self._buckets[cell]
+
+    def _cells_within(self, lat: float, lon: float, radius_km: float) -> Optional[Iterable[str]]:
+        """Cells overlapping the radius' bounding box, or None when scanning everything is cheaper."""
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        lat_min, lat_max = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        cos_lat = min(math.cos(math.radians(lat_min)), math.cos(math.radians(lat_max)))
+        if cos_lat <= 0.01:
+            return None
+        dlon = min(180.0, dlat / cos_lat)
+
+        rows = int((lat_max - lat_min) / self._cell_lat) + 2
+        cols = int(2 * dlon / self._cell_lon) + 2
+        if rows * cols >= len(self._buckets):
+            return None
+
+        cells = set()
+        for i in range(rows):
+            cell_lat = min(lat_max, lat_min + i * self._cell_lat)
+            for j in range(cols):
+                cell_lon = _wrap_lon(min(lon + dlon, lon - dlon + j * self._cell_lon))
+                cells.add(geohash_encode(cell_lat, cell_lon, self.precision))
+        return cells
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> Iterable[Hashable]:
+        cells = self._cells_within(lat, lon, radius_km)
+        if cells is None:
+            return self._places.keys()
+        return (key for cell in cells for key in self._buckets.get(cell, ()))
+
+    def _matches(self, place: dict, category: Optional[str]) -> bool:
+        if not category:
+            return True
+        return category in (place.get("category"), place.get("class"), place.get("type"))
+
+    def within(self, lat: float, lon: float, radius_km: float, category: Optional[str] = None,
+               limit: Optional[int] = None) -> List[Tuple[float, dict]]:
+        """(distance_km, place) pairs within radius_km, nearest first."""
+        found = []
+        for key in self._candidates(lat, lon, radius_km):
+            place = self._places[key]
+            if not self._matches(place, category):
+                continue
+            distance = haversine_km(lat, lon, place["lat"], place["lon"])
+            if distance <= radius_km:
+                found.append((distance, key))
+        top = heapq.nsmallest(limit, found) if limit is not None else sorted(found)
+        return [(distance, self._places[key]) for distance, key in top]
+
+    def nearest(self, lat: float, lon: float, k: int = 10, category: Optional[str] = None) -> List[Tuple[float, dict]]:
+        """The k nearest places, widening the search radius until enough are found."""
+        radius_km = 50.0
+        while True:
+            found = self.within(lat, lon, radius_km, category, limit=k)
+            # Anything outside the radius is farther than everything inside it
+            if len(found) >= k or radius_km >= math.pi * EARTH_RADIUS_KM:
+                return found
+            radius_km *= 4
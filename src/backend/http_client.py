@@ -0,0 +1,173 @@
+"""
+Shared outbound HTTP clients
+One pooled httpx.AsyncClient per upstream, created in the app lifespan and
+handed to routers through the get_http_clients dependency
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+import httpx
+from fastapi import Request
+
+from cassette import UPSTREAM_MODE, LIVE, CassetteStore, CassetteTransport
+from singleflight import SingleFlight, SingleflightTransport
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+USER_AGENT = "InfinityExplorer/1.0 (+https://github.com/thirisha2006-S/Infinity-Explorer)"
+
+# Per-upstream pool sizes and timeouts (seconds); "retries" overrides MAX_RETRIES and
+# "coalesce": False skips the singleflight layer, which buffers whole response bodies
+UPSTREAMS = {
+    "nasa": {"max_connections": 10, "max_keepalive": 5, "timeout": 15.0},
+    "wikipedia": {"max_connections": 20, "max_keepalive": 10, "timeout": 10.0},
+    # Every nominatim request must pass the 1 req/s scheduler, so the transport never retries on its own
+    "nominatim": {"max_connections": 2, "max_keepalive": 2, "timeout": 10.0, "retries": 0},
+    "huggingface": {"max_connections": 10, "max_keepalive": 5, "timeout": 30.0},
+    # The media router coalesces its own fetches and streams them under a size cap
+    "media": {"max_connections": 20, "max_keepalive": 10, "timeout": 30.0, "coalesce": False},
+}
+DEFAULT_UPSTREAM = {"max_connections": 10, "max_keepalive": 5, "timeout": 10.0}
+CONNECT_TIMEOUT = 5.0
+
+# Retry policy: idempotent requests only, exponential backoff
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.2
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class HostStats:
+    """Latency and error counters for one upstream host."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency: float, error: bool = False):
+        self.requests += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        if error:
+            self.errors += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_latency_ms": round(self.total_latency / self.requests * 1000, 2) if self.requests else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 2),
+        }
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport with retries and per-host counters."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, stats: Dict[str, HostStats], owns_transport: bool = True,
+                 max_retries: int = MAX_RETRIES):
+        self._transport = transport
+        self._stats = stats
+        self._owns_transport = owns_transport
+        self.max_retries = max_retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host_stats = self._stats.setdefault(request.url.host, HostStats())
+        can_retry = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+
+        while True:
+            start = time.perf_counter()
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError:
+                host_stats.record(time.perf_counter() - start, error=True)
+                if not can_retry or attempt >= self.max_retries:
+                    raise
+            else:
+                host_stats.record(time.perf_counter() - start, error=response.status_code >= 500)
+                if not can_retry or attempt >= self.max_retries or response.status_code not in RETRY_STATUSES:
+                    return response
+                await response.aclose()
+
+            host_stats.retries += 1
+            await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+            attempt += 1
+
+    async def aclose(self):
+        if self._owns_transport:
+            await self._transport.aclose()
+
+
+class HTTPClients:
+    """Registry of pooled clients, one per upstream."""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, mode: str = UPSTREAM_MODE,
+                 cassettes: Optional[CassetteStore] = None):
+        # An injected transport (e.g. httpx.MockTransport) replaces the network for every upstream
+        self._transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.stats: Dict[str, HostStats] = {}
+        # live / record / replay / replay-or-live, see cassette.py
+        self.mode = mode
+        self.cassettes = cassettes or CassetteStore()
+        # Identical concurrent GETs across all upstreams share one request
+        self.singleflight = SingleFlight("http")
+
+    def client(self, upstream: str) -> httpx.AsyncClient:
+        """Get the pooled client for an upstream, creating it on first use."""
+        client = self._clients.get(upstream)
+        if client is None:
+            client = self._build_client(UPSTREAMS.get(upstream, DEFAULT_UPSTREAM))
+            self._clients[upstream] = client
+        return client
+
+    def _build_client(self, config: dict) -> httpx.AsyncClient:
+        if self._transport is not None:
+            inner = self._transport
+        else:
+            inner = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=config["max_connections"],
+                    max_keepalive_connections=config["max_keepalive"],
+                ),
+                http2=HTTP2_AVAILABLE,
+            )
+        transport = InstrumentedTransport(
+            inner, self.stats, owns_transport=self._transport is None,
+            max_retries=config.get("retries", MAX_RETRIES),
+        )
+        if self.mode != LIVE:
+            transport = CassetteTransport(transport, self.cassettes, self.mode)
+        if config.get("coalesce", True):
+            transport = SingleflightTransport(transport, self.singleflight)
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(config["timeout"], connect=CONNECT_TIMEOUT),
+            headers={"User-Agent": USER_AGENT},
+        )
+
+    def snapshot(self) -> dict:
+        """Per-host counters for diagnostics."""
+        return {host: stats.to_dict() for host, stats in self.stats.items()}
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        if self._transport is not None:
+            await self._transport.aclose()
+
+
+def get_http_clients(request: Request) -> HTTPClients:
+    """FastAPI dependency - override in tests to inject a stand-in transport."""
+    return request.app.state.http_clients
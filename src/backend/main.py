@@ -4,17 +4,43 @@ import os
 # Add current directory to path before any imports
 sys.path.insert(0, os.path.dirname(__file__))
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from routers import characters, chat, worlds, nasa, openstreetmap, achievements, notifications, daily_rewards, auth, wikipedia, nlp, analytics
+from routers import characters, chat, worlds, nasa, openstreetmap, achievements, notifications, daily_rewards, auth, wikipedia, nlp, analytics, diagnostics, media
 from database import init_db
+from article_store import init_article_store
+from http_client import HTTPClients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared resources on startup and release them on shutdown."""
+    http = HTTPClients()
+    app.state.http_clients = http
+    media.init_media_cache()
+    background_tasks = [
+        asyncio.ensure_future(wikipedia.featured_refresh_loop(http)),
+        asyncio.ensure_future(wikipedia.warm_article_store(http)),
+        asyncio.ensure_future(nasa.apod_prefetch_loop(http)),
+        asyncio.ensure_future(notifications.notification_purge_loop()),
+        asyncio.ensure_future(notifications.notification_stream_loop()),
+    ]
+    yield
+    for task in background_tasks:
+        task.cancel()
+    await http.aclose()
+
 
 app = FastAPI(
     title="Infinity Explorer API",
     description="Backend API for Infinity Explorer mobile app",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware for Flutter app
@@ -26,8 +52,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON payloads (articles, outlines, sections)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Initialize database
 init_db()
+init_article_store()
 
 # Include routers
 app.include_router(characters.router, prefix="/api/characters", tags=["Characters"])
@@ -42,6 +72,8 @@ app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(wikipedia.router, prefix="/api/wikipedia", tags=["Wikipedia"])
 app.include_router(nlp.router, prefix="/api/nlp", tags=["NLP"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
+app.include_router(media.router, prefix="/api/media", tags=["Media"])
+app.include_router(diagnostics.router, prefix="/api/diagnostics", tags=["Diagnostics"])
 
 
 # Serve frontend static files - use absolute path from project root
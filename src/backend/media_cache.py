@@ -0,0 +1,172 @@
+"""
+On-disk media cache
+Stores proxied images under content-addressed filenames, with a SQLite index
+mapping source keys to blobs and least-recently-used eviction by total size
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "data/media")
+
+# Total bytes kept on disk before least-recently-used blobs are evicted
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+# Evicted blobs stay on disk this long so responses already streaming them can finish
+MEDIA_UNLINK_DELAY = 5 * 60  # seconds
+
+# (path, content type, sha256 digest)
+CachedMedia = Tuple[str, str, str]
+
+
+class MediaCache:
+    """Content-addressed blob store with a source-key index."""
+
+    def __init__(self, root: str = MEDIA_CACHE_DIR, max_bytes: int = MEDIA_CACHE_MAX_BYTES,
+                 unlink_delay: float = MEDIA_UNLINK_DELAY):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.unlink_delay = unlink_delay
+        self.hits = 0
+        self.misses = 0
+        # (unlink after, digest) for evicted blobs; store() runs on worker threads
+        self._doomed: List[Tuple[float, str]] = []
+        self._doomed_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        conn = self._connect()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                content_type TEXT NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs (last_access);
+            CREATE TABLE IF NOT EXISTS sources (
+                key TEXT PRIMARY KEY,
+                digest TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sources_digest ON sources (digest);
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(os.path.join(self.root, "index.db"))
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def path_for(self, digest: str) -> str:
+        """Blobs are fanned out by the first two hex digits of their digest."""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def lookup(self, key: str) -> Optional[CachedMedia]:
+        """The cached blob for a source key, marking it recently used."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT b.digest, b.content_type FROM sources s JOIN blobs b ON b.digest = s.digest
+            WHERE s.key = ?
+        ''', (key,))
+        row = cursor.fetchone()
+        if row is None or not os.path.exists(self.path_for(row['digest'])):
+            conn.close()
+            self.misses += 1
+            return None
+        cursor.execute('UPDATE blobs SET last_access = ? WHERE digest = ?', (time.time(), row['digest']))
+        conn.commit()
+        conn.close()
+        self.hits += 1
+        return self.path_for(row['digest']), row['content_type'], row['digest']
+
+    def store(self, key: str, body: bytes, content_type: str) -> CachedMedia:
+        """Write a blob (once per distinct content) and point the key at it."""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.path_for(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+        conn = self._connect()
+        conn.execute('''
+            INSERT INTO blobs (digest, size, content_type, last_access) VALUES (?, ?, ?, ?)
+            ON CONFLICT(digest) DO UPDATE SET last_access = excluded.last_access
+        ''', (digest, len(body), content_type, time.time()))
+        conn.execute('INSERT OR REPLACE INTO sources (key, digest) VALUES (?, ?)', (key, digest))
+        conn.commit()
+        self.evict(conn, keep=digest)
+        self._unlink_expired(conn)
+        conn.close()
+        return path, content_type, digest
+
+    def evict(self, conn: sqlite3.Connection, keep: Optional[str] = None):
+        """Drop least-recently-used blobs until the cache is under 90% of its budget."""
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(SUM(size), 0) FROM blobs')
+        total = cursor.fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        cursor.execute('SELECT digest, size FROM blobs ORDER BY last_access ASC')
+        doomed = []
+        for digest, size in cursor.fetchall():
+            if total <= target:
+                break
+            if digest == keep:
+                continue
+            doomed.append((digest,))
+            total -= size
+        cursor.executemany('DELETE FROM sources WHERE digest = ?', doomed)
+        cursor.executemany('DELETE FROM blobs WHERE digest = ?', doomed)
+        conn.commit()
+        # Lookups miss from now on, but a FileResponse may be about to open the file
+        deadline = time.time() + self.unlink_delay
+        with self._doomed_lock:
+            self._doomed.extend((deadline, digest) for (digest,) in doomed)
+
+    def _unlink_expired(self, conn: sqlite3.Connection):
+        """Delete evicted blob files whose grace period is over, unless they were stored again."""
+        now = time.time()
+        with self._doomed_lock:
+            due = [digest for deadline, digest in self._doomed if deadline <= now]
+            if not due:
+                return
+            self._doomed = [(deadline, digest) for deadline, digest in self._doomed if deadline > now]
+        placeholders = ", ".join("?" for _ in due)
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT digest FROM blobs WHERE digest IN ({placeholders})', due)
+        revived = {row['digest'] for row in cursor.fetchall()}
+        for digest in due:
+            if digest in revived:
+                continue
+            try:
+                os.remove(self.path_for(digest))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict:
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs')
+        blobs, size = cursor.fetchone()
+        cursor.execute('SELECT COUNT(*) FROM sources')
+        sources = cursor.fetchone()[0]
+        conn.close()
+        lookups = self.hits + self.misses
+        return {
+            "blobs": blobs,
+            "sources": sources,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,86 @@
+"""
+In-memory prefix index for typeahead
+Names are indexed from every word start in one sorted array, so a prefix
+lookup is a binary search plus a scan of the matching run
+"""
+
+import bisect
+import heapq
+import unicodedata
+from typing import Dict, Hashable, List, Tuple
+
+# Only the first few words of a name start an indexed term
+MAX_TERM_WORDS = 5
+
+
+def normalize_text(text: str) -> str:
+    """Case-folded, accent-stripped, whitespace-collapsed form used for matching."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.replace(",", " ").split())
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over names, ranked by a per-item popularity score."""
+
+    def __init__(self, memo_prefix_length: int = 2):
+        self._terms: List[Tuple[str, int]] = []
+        self._ids: Dict[Hashable, int] = {}
+        self._keys: List[Hashable] = []
+        self._items: List[dict] = []
+        self._scores: List[float] = []
+        self._names: List[str] = []
+        # Short prefixes match long runs, so their ranked results are memoized until the next change
+        self._memo_prefix_length = memo_prefix_length
+        self._memo: Dict[Tuple[str, int], List[dict]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Hashable, name: str, item: dict, score: float = 0.0):
+        """Index an item under name, or replace the item and add to the score of a known key."""
+        self._memo.clear()
+        item_id = self._ids.get(key)
+        if item_id is not None:
+            self._items[item_id] = item
+            self._scores[item_id] += score
+            return
+
+        normalized = normalize_text(name)
+        if not normalized:
+            return
+        item_id = len(self._keys)
+        self._ids[key] = item_id
+        self._keys.append(key)
+        self._items.append(item)
+        self._scores.append(score)
+        self._names.append(normalized)
+
+        words = normalized.split()
+        for i in range(min(len(words), MAX_TERM_WORDS)):
+            bisect.insort(self._terms, (" ".join(words[i:]), item_id))
+
+    def search(self, prefix: str, limit: int = 8) -> List[dict]:
+        """Items with a word starting with prefix, most popular first (shorter names break ties)."""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        memo_key = (prefix, limit)
+        if len(prefix) <= self._memo_prefix_length and memo_key in self._memo:
+            return self._memo[memo_key]
+
+        matched = set()
+        terms = self._terms
+        i = bisect.bisect_left(terms, (prefix, -1))
+        while i < len(terms) and terms[i][0].startswith(prefix):
+            matched.add(terms[i][1])
+            i += 1
+
+        ranked = heapq.nsmallest(
+            limit, matched,
+            key=lambda i: (-self._scores[i], len(self._names[i]), self._names[i]),
+        )
+        results = [self._items[i] for i in ranked]
+        if len(prefix) <= self._memo_prefix_length:
+            self._memo[memo_key] = results
+        return results
@@ -0,0 +1,66 @@
+"""
+In-process publish/subscribe
+Fans published items out to per-connection bounded queues; a subscriber
+that falls behind is flagged instead of growing its queue
+"""
+
+import asyncio
+from typing import Any, Dict, Hashable, Set
+
+
+class Subscription:
+    """One consumer's bounded queue on a channel."""
+
+    __slots__ = ("channel", "queue", "overflowed")
+
+    def __init__(self, channel: Hashable, max_pending: int):
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        # Set when items were dropped; the consumer must catch up from the source of truth
+        self.overflowed = False
+
+
+class Broker:
+    """Delivers items published on a channel to every current subscriber of it."""
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._channels: Dict[Hashable, Set[Subscription]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, channel: Hashable) -> Subscription:
+        subscription = Subscription(channel, self.max_pending)
+        self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._channels.get(subscription.channel)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._channels[subscription.channel]
+
+    def has_subscribers(self, channel: Hashable = None) -> bool:
+        if channel is None:
+            return bool(self._channels)
+        return channel in self._channels
+
+    def publish(self, channel: Hashable, item: Any):
+        for subscription in self._channels.get(channel, ()):
+            try:
+                subscription.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self.dropped += 1
+        self.published += 1
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self._channels),
+            "subscribers": sum(len(s) for s in self._channels.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+            "max_pending": self.max_pending,
+        }
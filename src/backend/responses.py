@@ -0,0 +1,63 @@
+"""
+Pre-encoded JSON responses with cache validators
+"""
+
+import hashlib
+import json
+from typing import Any, Dict
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag from the response body."""
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match names etag (weak comparison, as RFC 9110 requires)."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def conditional_json_response(request: Request, body: bytes, etag: str = None, max_age: int = 3600) -> Response:
+    """Serve encoded JSON with ETag/Cache-Control, or 304 when the client's copy is current."""
+    etag = etag or etag_for(body)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Constant payloads only change on deploy, so clients may keep them for a day
+STATIC_MAX_AGE = 24 * 60 * 60
+
+
+class StaticResponse:
+    """A constant JSON payload encoded once, with its ETag and headers built up front."""
+
+    def __init__(self, payload: Any, max_age: int = STATIC_MAX_AGE):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        self.etag = etag_for(self.body)
+        self.headers = {"ETag": self.etag, "Cache-Control": f"public, max-age={max_age}"}
+
+    def __call__(self, request: Request) -> Response:
+        if etag_matches(request, self.etag):
+            return Response(status_code=304, headers=self.headers)
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
+
+
+# Every registered constant response, by name, for diagnostics
+static_responses: Dict[str, StaticResponse] = {}
+
+
+def register_static(name: str, payload: Any, max_age: int = STATIC_MAX_AGE) -> StaticResponse:
+    """Encode a constant payload once at import time and keep it in the registry."""
+    response = StaticResponse(payload, max_age)
+    static_responses[name] = response
+    return response
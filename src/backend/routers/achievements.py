@@ -1,7 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
+from responses import register_static
 
 router = APIRouter()
 
@@ -235,16 +236,20 @@ quest_progress = {}
 achievement_progress = {}
 
 
+ACHIEVEMENTS_RESPONSE = register_static("achievements", {"achievements": ACHIEVEMENTS})
+QUESTS_RESPONSE = register_static("quests", {"quests": QUESTS})
+
+
 @router.get("/achievements")
-async def get_all_achievements():
+async def get_all_achievements(request: Request):
     """Get all available achievements."""
-    return {"achievements": ACHIEVEMENTS}
+    return ACHIEVEMENTS_RESPONSE(request)
 
 
 @router.get("/quests")
-async def get_all_quests():
+async def get_all_quests(request: Request):
     """Get all available quests."""
-    return {"quests": QUESTS}
+    return QUESTS_RESPONSE(request)
 
 
 @router.get("/progress/{character_name}")
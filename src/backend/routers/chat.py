@@ -2,7 +2,7 @@ import random
 from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional, List
-from database import CharacterDB, MessageDB
+from database import CharacterDB, MessageDB, EmotionStateDB
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
@@ -67,6 +67,7 @@ async def send_message(data: ChatMessage):
     
     # Save user message
     MessageDB.add(data.character_name, "user", data.message, emotion)
+    EmotionStateDB.record(data.character_name, emotion, data.world_id)
     
     # Get character for context
     char = CharacterDB.get(data.character_name)
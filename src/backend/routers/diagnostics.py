@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends
+from http_client import HTTPClients, get_http_clients
+from article_store import ArticleStore
+from responses import static_responses
+from routers import media, nasa, nlp, notifications, openstreetmap, wikipedia
+
+router = APIRouter()
+
+
+@router.get("/http")
+async def get_http_stats(http: HTTPClients = Depends(get_http_clients)):
+    """Get per-host latency and error counters for outbound requests."""
+    return {
+        "hosts": http.snapshot(),
+        "upstream_mode": http.mode,
+        "cassettes": http.cassettes.stats(),
+        "singleflight": http.singleflight.stats(),
+    }
+
+
+@router.get("/nlp")
+async def get_nlp_stats():
+    """Get HuggingFace micro-batching counters and circuit breaker state."""
+    return {
+        "batching": nlp.huggingface_batcher.stats(),
+        "breaker": nlp.huggingface_breaker.snapshot(),
+        "singleflight": nlp.huggingface_flight.stats(),
+        "hedge_budget_ms": nlp.HF_HEDGE_BUDGET_MS,
+    }
+
+
+@router.get("/wikipedia")
+async def get_wikipedia_stats():
+    """Get Wikipedia article cache and local store counters."""
+    return {**wikipedia.stats(), "article_store": ArticleStore.stats()}
+
+
+@router.get("/nasa")
+async def get_nasa_stats():
+    """Get NASA feed cache counters."""
+    return nasa.stats()
+
+
+@router.get("/osm")
+async def get_osm_stats():
+    """Get Nominatim scheduler counters, nearby-place index size and reverse-geocode cache hit rate."""
+    return {
+        "scheduler": openstreetmap.nominatim_scheduler.stats(),
+        "place_index": len(openstreetmap.place_index),
+        "name_index": len(openstreetmap.name_index),
+        "reverse_cache": openstreetmap.reverse_cache_stats(),
+    }
+
+
+@router.get("/media")
+async def get_media_stats():
+    """Get media proxy disk cache usage and hit rate."""
+    return media.stats()
+
+
+@router.get("/notifications")
+async def get_notification_stream_stats():
+    """Get open notification streams and push counters."""
+    return notifications.notification_broker.stats()
+
+
+@router.get("/static")
+async def get_static_responses():
+    """Get the pre-encoded constant responses and their ETags."""
+    return {
+        name: {"etag": response.etag, "bytes": len(response.body)}
+        for name, response in static_responses.items()
+    }
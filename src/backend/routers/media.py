@@ -0,0 +1,218 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from typing import Optional
+from urllib.parse import urlsplit
+import asyncio
+import io
+import os
+import httpx
+from http_client import HTTPClients, get_http_clients
+from media_cache import CachedMedia, MediaCache
+from responses import etag_matches
+from singleflight import SingleFlight
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+    # Undecodable, truncated or oversized (decompression bomb) images are served unresized
+    DOWNSCALE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+except ImportError:
+    PIL_AVAILABLE = False
+    DOWNSCALE_ERRORS = (OSError, ValueError)
+
+router = APIRouter()
+
+# Only images from the upstreams the apps already use are proxied
+MEDIA_ALLOWED_HOSTS = {
+    "apod.nasa.gov",
+    "mars.nasa.gov",
+    "mars.jpl.nasa.gov",
+    "images-assets.nasa.gov",
+    "upload.wikimedia.org",
+    "tile.openstreetmap.org",
+    "a.tile.openstreetmap.org",
+    "b.tile.openstreetmap.org",
+    "c.tile.openstreetmap.org",
+}
+OSM_TILE_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+
+# Raster formats only - SVG can carry script and would run on the app's origin
+MEDIA_ALLOWED_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/avif"}
+# Sent with every proxied image so a mislabelled body can't be sniffed or run as a document
+MEDIA_SECURITY_HEADERS = {"Content-Security-Policy": "default-src 'none'", "X-Content-Type-Options": "nosniff"}
+
+# Requested widths are rounded up to one of these so variants are shared
+MEDIA_WIDTHS = (160, 320, 640, 1024, 1600)
+MEDIA_MAX_REDIRECTS = 3
+MEDIA_MAX_FETCH_BYTES = int(os.getenv("MEDIA_MAX_FETCH_BYTES", str(20 * 1024 * 1024)))
+MEDIA_MAX_AGE = 7 * 24 * 60 * 60  # blobs are content-addressed, so clients can keep them
+
+# Opened in the app lifespan (init_media_cache) so importing the router touches no files
+media_cache: Optional[MediaCache] = None
+_media_flight = SingleFlight("media")
+
+
+def init_media_cache() -> MediaCache:
+    """Open the on-disk media cache, creating its directory and index on first use."""
+    global media_cache
+    if media_cache is None:
+        media_cache = MediaCache()
+    return media_cache
+
+
+def _allowed(url: str) -> bool:
+    parts = urlsplit(url)
+    return parts.scheme == "https" and parts.hostname in MEDIA_ALLOWED_HOSTS
+
+
+def _variant_width(width: Optional[int]) -> Optional[int]:
+    if width is None or not PIL_AVAILABLE:
+        return None
+    return next((w for w in MEDIA_WIDTHS if w >= width), MEDIA_WIDTHS[-1])
+
+
+def _downscale(body: bytes, width: int) -> Optional[bytes]:
+    """Resize to width keeping aspect ratio; None if the image is already that small."""
+    with Image.open(io.BytesIO(body)) as img:
+        if img.width <= width:
+            return None
+        height = max(1, round(img.height * width / img.width))
+        resized = img.resize((width, height), Image.LANCZOS)
+        out = io.BytesIO()
+        if img.format == "PNG":
+            resized.save(out, format="PNG", optimize=True)
+        else:
+            resized.convert("RGB").save(out, format="JPEG", quality=82, optimize=True)
+        return out.getvalue()
+
+
+async def _fetch_original(http: HTTPClients, url: str) -> CachedMedia:
+    key = url
+    cached = await asyncio.to_thread(media_cache.lookup, key)
+    if cached is not None:
+        return cached
+    client = http.client("media")
+    try:
+        # Follow redirects by hand so every hop stays on the allowlist
+        for _ in range(MEDIA_MAX_REDIRECTS + 1):
+            async with client.stream("GET", url) as response:
+                if response.is_redirect:
+                    url = str(response.next_request.url)
+                    if not _allowed(url):
+                        raise HTTPException(status_code=502, detail="Upstream redirected to a disallowed host")
+                    continue
+                content_type = _check_media_response(response)
+                body = await _read_capped(response)
+                break
+        else:
+            raise HTTPException(status_code=502, detail="Upstream redirected too many times")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to fetch media: {e}")
+    return await asyncio.to_thread(media_cache.store, key, body, content_type)
+
+
+def _check_media_response(response: httpx.Response) -> str:
+    """The image content type of an upstream response, rejecting anything not worth reading."""
+    if response.status_code != 200:
+        raise HTTPException(status_code=502, detail=f"Upstream returned {response.status_code}")
+    content_type = response.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in MEDIA_ALLOWED_TYPES:
+        raise HTTPException(status_code=415, detail="Only raster images can be proxied")
+    length = response.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MEDIA_MAX_FETCH_BYTES:
+        raise HTTPException(status_code=413, detail="Media is too large to proxy")
+    return content_type
+
+
+async def _read_capped(response: httpx.Response) -> bytes:
+    """Read a streamed body, giving up as soon as it passes MEDIA_MAX_FETCH_BYTES."""
+    chunks = []
+    total = 0
+    async for chunk in response.aiter_bytes():
+        total += len(chunk)
+        if total > MEDIA_MAX_FETCH_BYTES:
+            raise HTTPException(status_code=413, detail="Media is too large to proxy")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _load_media(http: HTTPClients, url: str, width: Optional[int]) -> CachedMedia:
+    """Cached original, or a cached downscaled variant when a width is requested."""
+    original = await _fetch_original(http, url)
+    if width is None:
+        return original
+
+    key = f"{url}#w={width}"
+    cached = await asyncio.to_thread(media_cache.lookup, key)
+    if cached is not None:
+        return cached
+    path, content_type, _ = original
+    body = await asyncio.to_thread(_read_file, path)
+    try:
+        resized = await asyncio.to_thread(_downscale, body, width)
+    except DOWNSCALE_ERRORS:
+        resized = None
+    if resized is None:
+        # Already small enough (or not decodable) - the variant key points at the original blob
+        return await asyncio.to_thread(media_cache.store, key, body, content_type)
+    resized_type = "image/png" if content_type == "image/png" else "image/jpeg"
+    return await asyncio.to_thread(media_cache.store, key, resized, resized_type)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _media_response(request: Request, media: CachedMedia) -> Response:
+    path, content_type, digest = media
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={MEDIA_MAX_AGE}", **MEDIA_SECURITY_HEADERS}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=content_type, headers=headers)
+
+
+async def _serve(request: Request, http: HTTPClients, url: str, w: Optional[int]) -> Response:
+    if url.startswith("http://"):
+        # NASA still hands out plain-http image URLs; every allowed host serves https
+        url = "https://" + url[len("http://"):]
+    if not _allowed(url):
+        raise HTTPException(status_code=400, detail="URL host is not allowed")
+    width = _variant_width(w)
+    media = await _media_flight.do((url, width), lambda: _load_media(http, url, width))
+    return _media_response(request, media)
+
+
+@router.get("")
+async def get_media(
+    request: Request,
+    url: str = Query(..., description="https URL of an APOD, rover, Wikipedia or map tile image"),
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Target width; rounded up to a standard size"),
+    http: HTTPClients = Depends(get_http_clients),
+):
+    """Proxy an image through the on-disk cache, optionally downscaled."""
+    return await _serve(request, http, url, w)
+
+
+@router.get("/tile/{z}/{x}/{y}.png")
+async def get_map_tile(
+    request: Request,
+    z: int,
+    x: int,
+    y: int,
+    http: HTTPClients = Depends(get_http_clients),
+):
+    """Proxy an OpenStreetMap tile through the on-disk cache."""
+    if not 0 <= z <= 19 or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise HTTPException(status_code=400, detail="Invalid tile coordinates")
+    return await _serve(request, http, OSM_TILE_URL.format(z=z, x=x, y=y), None)
+
+
+def stats() -> dict:
+    """Disk cache usage and hit rate for diagnostics."""
+    return {
+        "cache": media_cache.stats() if media_cache is not None else None,
+        "singleflight": _media_flight.stats(),
+        "resizing": PIL_AVAILABLE,
+    }
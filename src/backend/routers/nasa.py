@@ -1,19 +1,68 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
-from typing import Optional
-import httpx
+from typing import List, Optional
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from array import array
+import asyncio
+import bisect
+import heapq
+import json
+import logging
+import math
 import os
+import time
+import httpx
+from cache import TTLCache
+from database import ApodDB
+from http_client import HTTPClients, get_http_clients
+from singleflight import SingleFlight
+from responses import conditional_json_response, register_static
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 NASA_API_KEY = os.getenv("NASA_API_KEY", "DEMO_KEY")
 NASA_BASE_URL = "https://api.nasa.gov"
 
+# APOD dates follow US Eastern time; fall back to EST if no tz database is installed
+try:
+    from zoneinfo import ZoneInfo
+    APOD_TIMEZONE = ZoneInfo("America/New_York")
+except Exception:
+    APOD_TIMEZONE = timezone(timedelta(hours=-5))
+
+APOD_FIRST_DATE = date(1995, 6, 16)
+APOD_MAX_RANGE_DAYS = 100
+APOD_ARCHIVE_MAX_AGE = 365 * 24 * 60 * 60  # past entries are immutable
+APOD_PREFETCH_DELAY = 5 * 60  # seconds after Eastern midnight before fetching
+APOD_RETRY_INTERVAL = 10 * 60  # seconds between checks while today's entry is missing
+
+_apod_state = {"checked": float("-inf")}
+
+# NASA's feed accepts at most 7 days per request
+NEO_CHUNK_DAYS = 7
+NEO_MAX_RANGE_DAYS = 90
+NEO_FETCH_CONCURRENCY = 3
+NEO_TTL = 6 * 60 * 60  # orbit solutions are refined, so days are re-fetched occasionally
+NEO_CACHE_DAYS = 730
+
+_neo_days = TTLCache(ttl=NEO_TTL, max_entries=NEO_CACHE_DAYS)
+
+# Parsed photo manifests keyed by (rover, sol, camera); camera "" is every camera
+ROVER_MANIFEST_TTL = 24 * 60 * 60
+ROVER_MANIFEST_CACHE_SIZE = 256
+ROVER_PREFETCH_SOLS = 1  # sols either side of the one being browsed
+
+_rover_manifests = TTLCache(ttl=ROVER_MANIFEST_TTL, max_entries=ROVER_MANIFEST_CACHE_SIZE)
+_rover_flight = SingleFlight("nasa-rover-manifest")
+_rover_prefetch_tasks = set()
+
 
 class APODResponse(BaseModel):
     title: str
     explanation: str
     url: str
+    hdurl: Optional[str] = None
     media_type: str
     date: str
 
@@ -77,113 +126,443 @@ PLANETS_INFO = {
 }
 
 
-@router.get("/apod")
-async def get_apod():
-    """Get Astronomy Picture of the Day from NASA."""
+def _eastern_today() -> date:
+    """APOD publishes on US Eastern dates, so 'today' is today in New York."""
+    return datetime.now(APOD_TIMEZONE).date()
+
+
+def _parse_date(value: str) -> date:
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{NASA_BASE_URL}/planetary/apod",
-                params={"api_key": NASA_API_KEY},
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return APODResponse(
-                    title=data.get("title", ""),
-                    explanation=data.get("explanation", ""),
-                    url=data.get("url", ""),
-                    media_type=data.get("media_type", "image"),
-                    date=data.get("date", ""),
-                )
-            return {"error": "Failed to fetch APOD"}
-    except Exception as e:
-        return {"error": str(e)}
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value} (expected YYYY-MM-DD)")
+
+
+def _apod_entry(data: dict) -> dict:
+    return APODResponse(
+        title=data.get("title", ""),
+        explanation=data.get("explanation", ""),
+        url=data.get("url", ""),
+        hdurl=data.get("hdurl"),
+        media_type=data.get("media_type", "image"),
+        date=data.get("date", ""),
+    ).model_dump()
+
+
+def _next_apod_publish(today: date) -> datetime:
+    """When the entry after today's is expected to be stored (Eastern midnight plus the prefetch delay)."""
+    midnight = datetime.combine(today + timedelta(days=1), dt_time(0), APOD_TIMEZONE)
+    return midnight + timedelta(seconds=APOD_PREFETCH_DELAY)
+
+
+def _apod_max_age(entry_date: str, requested: bool) -> int:
+    """
+    A past day asked for by date never changes; the latest entry is only good
+    until the next publish, and yesterday's stand-in until today's shows up
+    """
+    today = _eastern_today()
+    if entry_date < today.isoformat():
+        return APOD_ARCHIVE_MAX_AGE if requested else APOD_RETRY_INTERVAL
+    seconds = int((_next_apod_publish(today) - datetime.now(APOD_TIMEZONE)).total_seconds())
+    return max(60, min(seconds, APOD_ARCHIVE_MAX_AGE))
+
+
+async def _fetch_apod(http: HTTPClients, **params) -> List[dict]:
+    """Fetch one or more APOD entries from NASA and store them by date."""
+    client = http.client("nasa")
+    response = await client.get(
+        f"{NASA_BASE_URL}/planetary/apod",
+        params={"api_key": NASA_API_KEY, **params},
+    )
+    if response.status_code != 200:
+        return []
+    data = response.json()
+    entries = [_apod_entry(item) for item in (data if isinstance(data, list) else [data])]
+    ApodDB.upsert_many(entries)
+    return entries
+
+
+async def _latest_apod(http: HTTPClients) -> Optional[dict]:
+    """Today's entry from the store, asking NASA at most once per retry interval until it appears."""
+    today = _eastern_today().isoformat()
+    stored = ApodDB.get(today)
+    if stored:
+        return stored
+
+    now = time.monotonic()
+    if now - _apod_state["checked"] >= APOD_RETRY_INTERVAL:
+        _apod_state["checked"] = now
+        try:
+            await _fetch_apod(http)
+        except Exception:
+            # Unreachable, malformed or unstorable - serve what the store has
+            logger.warning("APOD fetch failed", exc_info=True)
+    # Before today's picture is published this is yesterday's
+    return ApodDB.latest()
+
+
+@router.get("/apod")
+async def get_apod(
+    request: Request,
+    date: Optional[str] = Query(None, description="Single day, YYYY-MM-DD"),
+    start_date: Optional[str] = Query(None, description="First day of a range, YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="Last day of a range (defaults to today)"),
+    http: HTTPClients = Depends(get_http_clients),
+):
+    """Get Astronomy Picture of the Day from NASA, served from the date-keyed store."""
+    today = _eastern_today()
+
+    if start_date:
+        start = _parse_date(start_date)
+        end = _parse_date(end_date) if end_date else today
+        end = min(end, today)
+        if start < APOD_FIRST_DATE or start > end:
+            raise HTTPException(status_code=400, detail="Invalid date range")
+        if (end - start).days >= APOD_MAX_RANGE_DAYS:
+            raise HTTPException(status_code=400, detail=f"Date range is limited to {APOD_MAX_RANGE_DAYS} days")
+
+        stored = {e["date"]: e for e in ApodDB.get_range(start.isoformat(), end.isoformat())}
+        wanted = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        missing = [d for d in wanted if d not in stored]
+        if missing and missing[-1] == today.isoformat():
+            # Today's entry may not be published yet, so it goes through the throttled check
+            latest = await _latest_apod(http)
+            if latest and latest["date"] == missing[-1]:
+                stored[latest["date"]] = latest
+            missing = missing[:-1]
+        if missing:
+            # One upstream call covering just the span of missing days
+            try:
+                for entry in await _fetch_apod(http, start_date=missing[0], end_date=missing[-1]):
+                    stored[entry["date"]] = entry
+            except httpx.HTTPError:
+                pass
+        entries = [_apod_entry(stored[d]) for d in wanted if d in stored]
+        body = json.dumps(entries).encode()
+        if len(entries) == len(wanted) and end < today:
+            max_age = APOD_ARCHIVE_MAX_AGE
+        else:
+            # Incomplete or reaching today: only good until the missing days can be retried
+            max_age = _apod_max_age(entries[-1]["date"] if entries else "", requested=False)
+        return conditional_json_response(request, body, max_age=max_age)
+
+    if date:
+        day = _parse_date(date)
+        if day < APOD_FIRST_DATE or day > today:
+            raise HTTPException(status_code=400, detail="Date must be between 1995-06-16 and today")
+        entry = ApodDB.get(day.isoformat())
+        if entry is None and day == today:
+            entry = await _latest_apod(http)
+            if entry and entry["date"] != day.isoformat():
+                entry = None
+        elif entry is None:
+            try:
+                fetched = await _fetch_apod(http, date=day.isoformat())
+            except httpx.HTTPError:
+                fetched = []
+            entry = fetched[0] if fetched else None
+    else:
+        entry = await _latest_apod(http)
+
+    if entry is None:
+        return {"error": "Failed to fetch APOD"}
+    body = json.dumps(_apod_entry(entry)).encode()
+    return conditional_json_response(request, body, max_age=_apod_max_age(entry["date"], requested=bool(date)))
+
+
+async def apod_prefetch_loop(http: HTTPClients):
+    """Background job started in the app lifespan - stores each new APOD just after it publishes"""
+    while True:
+        today = _eastern_today()
+        try:
+            if ApodDB.get(today.isoformat()) is None:
+                await _fetch_apod(http)
+            published = ApodDB.get(today.isoformat()) is not None
+        except Exception:
+            # A bad response or database error must not end the job
+            logger.exception("APOD prefetch failed")
+            published = False
+        if not published:
+            # Not published yet (or NASA unreachable) - try again shortly
+            await asyncio.sleep(APOD_RETRY_INTERVAL)
+            continue
+
+        delay = (_next_apod_publish(today) - datetime.now(APOD_TIMEZONE)).total_seconds()
+        await asyncio.sleep(max(delay, 1))
+
+
+PLANET_RESPONSES = {key: register_static(f"planet:{key}", info) for key, info in PLANETS_INFO.items()}
+ALL_PLANETS_RESPONSE = register_static("planets", {"planets": list(PLANETS_INFO.values())})
 
 
 @router.get("/planet/{planet_name}")
-async def get_planet_info(planet_name: str):
+async def get_planet_info(planet_name: str, request: Request):
     """Get information about a planet."""
-    planet_key = planet_name.lower()
-    if planet_key in PLANETS_INFO:
-        return PLANETS_INFO[planet_key]
+    response = PLANET_RESPONSES.get(planet_name.lower())
+    if response is not None:
+        return response(request)
     return {"error": "Planet not found"}
 
 
 @router.get("/planets")
-async def get_all_planets():
+async def get_all_planets(request: Request):
     """Get information about all planets."""
-    return {"planets": list(PLANETS_INFO.values())}
+    return ALL_PLANETS_RESPONSE(request)
+
+
+async def _fetch_rover_manifest(http: HTTPClients, rover: str, sol: int, camera: str) -> Optional[tuple]:
+    """Photo manifest for a sol as compact (id, img_src, camera, earth_date) rows, cached per camera."""
+    # A cached all-camera manifest answers any single-camera query
+    if camera:
+        everything = _rover_manifests.get((rover, sol, ""))
+        if everything is not None:
+            manifest = tuple(p for p in everything if p[2] == camera)
+            _rover_manifests.set((rover, sol, camera), manifest)
+            return manifest
+
+    params = {"api_key": NASA_API_KEY, "sol": sol}
+    if camera:
+        params["camera"] = camera
+    try:
+        client = http.client("nasa")
+        response = await client.get(f"{NASA_BASE_URL}/mars-photos/api/v1/rovers/{rover}/photos", params=params)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+
+    manifest = tuple(sorted(
+        (
+            p["id"], p["img_src"],
+            p.get("camera", {}).get("name", "").lower(),
+            p.get("earth_date", ""),
+        )
+        for p in response.json().get("photos", [])
+    ))
+    _rover_manifests.set((rover, sol, camera), manifest)
+    return manifest
+
+
+async def _rover_manifest(http: HTTPClients, rover: str, sol: int, camera: str) -> Optional[tuple]:
+    key = (rover, sol, camera)
+    manifest = _rover_manifests.get(key)
+    if manifest is not None:
+        return manifest
+    return await _rover_flight.do(key, lambda: _fetch_rover_manifest(http, rover, sol, camera))
+
+
+async def _prefetch_adjacent_sols(http: HTTPClients, rover: str, sol: int, camera: str):
+    """Warm the manifests either side of the sol a user just opened."""
+    for offset in range(1, ROVER_PREFETCH_SOLS + 1):
+        for adjacent in (sol + offset, sol - offset):
+            if adjacent >= 0 and _rover_manifests.get((rover, adjacent, camera)) is None:
+                await _rover_manifest(http, rover, adjacent, camera)
 
 
 @router.get("/rover/{rover_name}")
-async def get_rover_photos(rover_name: str, sol: int = 1000):
-    """Get photos from NASA rovers (Curiosity, Opportunity, Spirit)."""
+async def get_rover_photos(
+    rover_name: str,
+    sol: int = Query(1000, ge=0),
+    camera: Optional[str] = Query(None, description="Camera abbreviation, e.g. FHAZ, NAVCAM"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    cursor: Optional[int] = Query(None, description="Return photos after this photo id"),
+    http: HTTPClients = Depends(get_http_clients),
+):
+    """Get photos from NASA rovers (Curiosity, Opportunity, Spirit).
+
+    The sol's manifest is cached, so later pages and other cameras are
+    served without going back to NASA.
+    """
     valid_rovers = ["curiosity", "opportunity", "spirit"]
-    if rover_name.lower() not in valid_rovers:
+    rover = rover_name.lower()
+    if rover not in valid_rovers:
         return {"error": "Rover not found"}
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{NASA_BASE_URL}/mars-photos/api/v1/rovers/{rover_name}/photos",
-                params={"api_key": NASA_API_KEY, "sol": sol},
-            )
-            if response.status_code == 200:
-                data = response.json()
-                photos = data.get("photos", [])[:10]  # Limit to 10 photos
-                return {
-                    "rover": rover_name,
-                    "sol": sol,
-                    "photos": [{"id": p["id"], "img_src": p["img_src"]} for p in photos],
-                }
-            return {"error": "Failed to fetch rover photos"}
-    except Exception as e:
-        return {"error": str(e)}
+    camera = (camera or "").lower()
 
+    manifest = await _rover_manifest(http, rover, sol, camera)
+    if manifest is None:
+        return {"error": "Failed to fetch rover photos"}
 
-@router.get("/neo")
-async def get_neo(start_date: str = None, end_date: str = None):
-    """Get Near Earth Objects (asteroids) close to Earth."""
-    import datetime
-    
-    if not start_date:
-        start_date = datetime.date.today().isoformat()
-    if not end_date:
-        end_date = (datetime.date.today() + datetime.timedelta(days=7)).isoformat()
-    
-    try:
-        async with httpx.AsyncClient() as client:
+    if cursor is None and page == 1:
+        # First page of a sol - warm the neighbours while the user looks at this one
+        task = asyncio.ensure_future(_prefetch_adjacent_sols(http, rover, sol, camera))
+        _rover_prefetch_tasks.add(task)
+        task.add_done_callback(_rover_prefetch_tasks.discard)
+
+    if cursor is not None:
+        start = bisect.bisect_right(manifest, (cursor, chr(0x10FFFF)))
+    else:
+        start = (page - 1) * page_size
+    photos = manifest[start:start + page_size]
+    has_more = start + page_size < len(manifest)
+
+    return {
+        "rover": rover,
+        "sol": sol,
+        "camera": camera or None,
+        "total": len(manifest),
+        "page": start // page_size + 1,
+        "photos": [
+            {"id": p[0], "img_src": p[1], "camera": p[2].upper(), "earth_date": p[3]}
+            for p in photos
+        ],
+        "next_cursor": photos[-1][0] if photos and has_more else None,
+    }
+
+
+class _NeoDay:
+    """Parsed NEO records for one day, stored column-wise to keep the cache compact."""
+
+    __slots__ = ("ids", "names", "diameter_km", "hazardous", "miss_km", "velocity_kps")
+
+    def __init__(self, objects: List[dict]):
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.diameter_km = array("d")
+        self.hazardous = bytearray()
+        self.miss_km = array("d")
+        self.velocity_kps = array("d")
+        for obj in objects:
+            approach = (obj.get("close_approach_data") or [{}])[0]
+            self.ids.append(str(obj.get("id", "")))
+            self.names.append(obj.get("name", ""))
+            self.diameter_km.append(float(
+                obj.get("estimated_diameter", {}).get("kilometers", {}).get("estimated_diameter_max", 0.0)
+            ))
+            self.hazardous.append(1 if obj.get("is_potentially_hazardous_asteroid") else 0)
+            # NaN marks an unknown miss distance (array("d") can't hold None)
+            miss_km = approach.get("miss_distance", {}).get("kilometers")
+            self.miss_km.append(float(miss_km) if miss_km is not None else math.nan)
+            self.velocity_kps.append(float(approach.get("relative_velocity", {}).get("kilometers_per_second", 0.0)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, i: int, day: str) -> dict:
+        return {
+            "id": self.ids[i],
+            "name": self.names[i],
+            "estimated_diameter_km": self.diameter_km[i],
+            "is_potentially_hazardous": bool(self.hazardous[i]),
+            "close_approach_date": day,
+            "miss_distance_km": None if math.isnan(self.miss_km[i]) else self.miss_km[i],
+            "relative_velocity_kps": self.velocity_kps[i],
+        }
+
+
+def _neo_chunks(days: List[date]) -> List[tuple]:
+    """Group days into contiguous (start, end) spans of at most NEO_CHUNK_DAYS."""
+    chunks = []
+    for day in days:
+        if chunks and day - chunks[-1][1] == timedelta(days=1) and (day - chunks[-1][0]).days < NEO_CHUNK_DAYS:
+            chunks[-1][1] = day
+        else:
+            chunks.append([day, day])
+    return [(start, end) for start, end in chunks]
+
+
+async def _fetch_neo_chunk(http: HTTPClients, start: date, end: date, limit: asyncio.Semaphore) -> bool:
+    """Fetch one feed window and cache every day in it; False if NASA didn't answer."""
+    async with limit:
+        try:
+            client = http.client("nasa")
             response = await client.get(
                 f"{NASA_BASE_URL}/neo/rest/v1/feed",
                 params={
                     "api_key": NASA_API_KEY,
-                    "start_date": start_date,
-                    "end_date": end_date,
+                    "start_date": start.isoformat(),
+                    "end_date": end.isoformat(),
                 },
             )
-            if response.status_code == 200:
-                data = response.json()
-                neo_count = data.get("element_count", 0)
-                near_earth_objects = data.get("near_earth_objects", {})
-                
-                # Get first 5 asteroids
-                asteroids = []
-                for date, objects in near_earth_objects.items():
-                    for obj in objects[:5]:
-                        asteroids.append({
-                            "name": obj["name"],
-                            "estimated_diameter_km": obj["estimated_diameter"]["kilometers"]["estimated_diameter_max"],
-                            "is_potentially_hazardous": obj["is_potentially_hazardous_asteroid"],
-                            "close_approach_date": obj["close_approach_data"][0]["close_approach_date"],
-                        })
-                    if len(asteroids) >= 5:
-                        break
-                
-                return {
-                    "count": neo_count,
-                    "date_range": f"{start_date} to {end_date}",
-                    "asteroids": asteroids,
-                }
-            return {"error": "Failed to fetch NEO data"}
-    except Exception as e:
-        return {"error": str(e)}
+        except httpx.HTTPError:
+            return False
+    if response.status_code != 200:
+        return False
+
+    near_earth_objects = response.json().get("near_earth_objects", {})
+    for i in range((end - start).days + 1):
+        day = (start + timedelta(days=i)).isoformat()
+        _neo_days.set(day, _NeoDay(near_earth_objects.get(day, [])))
+    return True
+
+
+@router.get("/neo")
+async def get_neo(
+    start_date: str = None,
+    end_date: str = None,
+    hazardous_only: bool = False,
+    min_diameter_km: float = Query(0.0, ge=0),
+    sort: str = Query("closest", pattern="^(closest|largest|fastest|date)$"),
+    limit: int = Query(5, ge=1, le=100),
+    http: HTTPClients = Depends(get_http_clients),
+):
+    """Get Near Earth Objects (asteroids) close to Earth.
+
+    Any date range is split into 7-day feed windows fetched in parallel;
+    filtering and top-K sorting run over the per-day cache.
+    """
+    start = _parse_date(start_date) if start_date else date.today()
+    end = _parse_date(end_date) if end_date else start + timedelta(days=7)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end - start).days >= NEO_MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {NEO_MAX_RANGE_DAYS} days")
+
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    missing = [day for day in days if _neo_days.get(day.isoformat()) is None]
+    if missing:
+        fetch_limit = asyncio.Semaphore(NEO_FETCH_CONCURRENCY)
+        await asyncio.gather(*(
+            _fetch_neo_chunk(http, chunk_start, chunk_end, fetch_limit)
+            for chunk_start, chunk_end in _neo_chunks(missing)
+        ))
+
+    count = 0
+    matches = []
+    unavailable = []
+    for day in days:
+        key = day.isoformat()
+        columns = _neo_days.get(key)
+        if columns is None:
+            unavailable.append(key)
+            continue
+        count += len(columns)
+        for i in range(len(columns)):
+            if hazardous_only and not columns.hazardous[i]:
+                continue
+            if columns.diameter_km[i] < min_diameter_km:
+                continue
+            matches.append((key, columns, i))
+
+    if len(unavailable) == len(days):
+        return {"error": "Failed to fetch NEO data"}
+
+    if sort == "closest":
+        known = [m for m in matches if not math.isnan(m[1].miss_km[m[2]])]
+        top = heapq.nsmallest(limit, known, key=lambda m: m[1].miss_km[m[2]])
+    elif sort == "largest":
+        top = heapq.nlargest(limit, matches, key=lambda m: m[1].diameter_km[m[2]])
+    elif sort == "fastest":
+        top = heapq.nlargest(limit, matches, key=lambda m: m[1].velocity_kps[m[2]])
+    else:
+        top = matches[:limit]
+
+    result = {
+        "count": count,
+        "matched": len(matches),
+        "date_range": f"{start.isoformat()} to {end.isoformat()}",
+        "asteroids": [columns.row(i, key) for key, columns, i in top],
+    }
+    if unavailable:
+        result["unavailable_dates"] = unavailable
+    return result
+
+
+def stats() -> dict:
+    """NEO and rover cache counters for diagnostics."""
+    return {
+        "neo_day_cache": _neo_days.stats(),
+        "rover_manifest_cache": _rover_manifests.stats(),
+        "rover_singleflight": _rover_flight.stats(),
+    }
@@ -3,17 +3,43 @@ NLP Router - HuggingFace Emotion Analysis
 Provides sentiment and emotion analysis for chat messages
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, Request, Response
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
 import httpx
 import os
+import time
+from batching import MicroBatcher
+from circuit_breaker import CircuitBreaker
+from singleflight import SingleFlight
+from database import EmotionStateDB
+from http_client import HTTPClients, get_http_clients
+from responses import register_static
 
 router = APIRouter(prefix="/nlp", tags=["NLP"])
 
 # HuggingFace Inference API (free tier)
 HUGGINGFACE_API_URL = "https://api-inference.huggingface.co/models/"
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
+EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+
+# Concurrent requests for the same model are sent as one batched call
+HF_BATCH_MAX_SIZE = int(os.getenv("HF_BATCH_MAX_SIZE", "16"))
+HF_BATCH_MAX_WAIT_MS = float(os.getenv("HF_BATCH_MAX_WAIT_MS", "10"))
+
+# Circuit breaker around the remote analyzer
+HF_BREAKER_WINDOW = int(os.getenv("HF_BREAKER_WINDOW", "20"))
+HF_BREAKER_ERROR_RATE = float(os.getenv("HF_BREAKER_ERROR_RATE", "0.5"))
+HF_BREAKER_SLOW_CALL_MS = float(os.getenv("HF_BREAKER_SLOW_CALL_MS", "5000"))
+HF_BREAKER_RESET_SECONDS = float(os.getenv("HF_BREAKER_RESET_SECONDS", "30"))
+
+# Hedged mode: answer locally if the remote result takes longer than this (0 disables)
+HF_HEDGE_BUDGET_MS = float(os.getenv("HF_HEDGE_BUDGET_MS", "1500"))
+
+# Shared budget for all analyzers in one /analyze request (seconds)
+ANALYSIS_DEADLINE = float(os.getenv("NLP_ANALYSIS_DEADLINE", "5.0"))
 
 # Emotion labels
 EMOTIONS = [
@@ -24,6 +50,12 @@ EMOTIONS = [
 # Sentiment labels
 SENTIMENTS = ["positive", "negative", "neutral"]
 
+# Sentiment direction of each emotion, used to derive sentiment from emotion state
+EMOTION_POLARITY = {
+    "joy": 1, "love": 1, "excitement": 1, "hope": 1, "gratitude": 1, "compassion": 1,
+    "sadness": -1, "anger": -1, "fear": -1, "disgust": -1,
+}
+
 
 class EmotionResult(BaseModel):
     """Model for emotion analysis result"""
@@ -48,93 +80,178 @@ class ConversationAnalysis(BaseModel):
     dominant_emotion: EmotionResult
     emotion_trend: List[EmotionResult]
     suggested_mood: str
+    fallback: List[str] = []  # "<analyzer>:<reason>" for analyzers answered by the local scorer
+    world_emotions: Dict[str, str] = {}  # dominant emotion per world
+
+
+# Reasons an analyzer was answered by the local scorer (reported in ConversationAnalysis.fallback)
+FALLBACK_NO_API_KEY = "no_api_key"
+FALLBACK_BREAKER_OPEN = "breaker_open"
+FALLBACK_TIMEOUT = "timeout"
+FALLBACK_MODEL_LOADING = "model_loading"
+FALLBACK_UPSTREAM_ERROR = "upstream_error"
+FALLBACK_DEADLINE = "deadline"
+FALLBACK_ERROR = "error"
 
 
 @router.post("/emotions")
-async def analyze_emotions(request: TextAnalysisRequest) -> List[EmotionResult]:
+async def analyze_emotions(
+    request: TextAnalysisRequest,
+    http: HTTPClients = Depends(get_http_clients),
+) -> List[EmotionResult]:
     """
     Analyze emotions in text using HuggingFace emotion model
     """
-    if not HUGGINGFACE_API_KEY:
-        # Fallback to simple rule-based analysis
-        return _simple_emotion_analysis(request.text)
-
-    async with httpx.AsyncClient() as client:
-        headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"}
-        
-        try:
-            response = await client.post(
-                HUGGINGFACE_API_URL + "j-hartmann/emotion-english-distilroberta-base",
-                headers=headers,
-                json={"inputs": request.text},
-                timeout=30.0,
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                for item in data[0]:
-                    results.append(EmotionResult(
-                        label=item["label"],
-                        score=item["score"]
-                    ))
-                return sorted(results, key=lambda x: x.score, reverse=True)
-            elif response.status_code == 503:
-                # Model loading, use fallback
-                return _simple_emotion_analysis(request.text)
-            else:
-                raise HTTPException(status_code=response.status_code, detail=response.text)
-                
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail=f"HuggingFace API error: {str(e)}")
+    results, _ = await _emotions(request.text, http)
+    return results
 
 
 @router.post("/sentiment")
-async def analyze_sentiment(request: TextAnalysisRequest) -> List[SentimentResult]:
+async def analyze_sentiment(
+    request: TextAnalysisRequest,
+    http: HTTPClients = Depends(get_http_clients),
+) -> List[SentimentResult]:
     """
     Analyze sentiment in text using HuggingFace sentiment model
     """
+    results, _ = await _sentiments(request.text, http)
+    return results
+
+
+async def _emotions(text: str, http: HTTPClients) -> Tuple[List[EmotionResult], Optional[str]]:
+    """Ranked emotions, plus the fallback reason when the local scorer answered"""
     if not HUGGINGFACE_API_KEY:
-        # Fallback to simple rule-based analysis
-        return _simple_sentiment_analysis(request.text)
-
-    async with httpx.AsyncClient() as client:
-        headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"}
-        
-        try:
-            response = await client.post(
-                HUGGINGFACE_API_URL + "distilbert-base-uncased-finetuned-sst-2-english",
-                headers=headers,
-                json={"inputs": request.text},
-                timeout=30.0,
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                for item in data[0]:
-                    results.append(SentimentResult(
-                        label=item["label"],
-                        score=item["score"]
-                    ))
-                return sorted(results, key=lambda x: x.score, reverse=True)
-            elif response.status_code == 503:
-                # Model loading, use fallback
-                return _simple_sentiment_analysis(request.text)
-            else:
-                raise HTTPException(status_code=response.status_code, detail=response.text)
-                
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail=f"HuggingFace API error: {str(e)}")
+        return _simple_emotion_analysis(text), FALLBACK_NO_API_KEY
+
+    labels, reason = await _classify(EMOTION_MODEL, text, http)
+    if labels is None:
+        return _simple_emotion_analysis(text), reason
+
+    results = [EmotionResult(label=item["label"], score=item["score"]) for item in labels]
+    return sorted(results, key=lambda x: x.score, reverse=True), None
+
+
+async def _sentiments(text: str, http: HTTPClients) -> Tuple[List[SentimentResult], Optional[str]]:
+    """Ranked sentiments, plus the fallback reason when the local scorer answered"""
+    if not HUGGINGFACE_API_KEY:
+        return _simple_sentiment_analysis(text), FALLBACK_NO_API_KEY
+
+    labels, reason = await _classify(SENTIMENT_MODEL, text, http)
+    if labels is None:
+        return _simple_sentiment_analysis(text), reason
+
+    results = [SentimentResult(label=item["label"], score=item["score"]) for item in labels]
+    return sorted(results, key=lambda x: x.score, reverse=True), None
+
+
+async def _classify(model: str, text: str, http: HTTPClients) -> Tuple[Optional[List[dict]], Optional[str]]:
+    """
+    Classify one text remotely; returns (labels, None), or (None, reason) when
+    the local scorer should answer (breaker open, model loading, upstream error or hedge budget exceeded)
+    """
+    if not huggingface_breaker.allow_request():
+        return None, FALLBACK_BREAKER_OPEN
+
+    # Identical concurrent texts share one remote call, which always finishes and
+    # reports to the breaker even when every request stops waiting for it
+    call = huggingface_flight.do((model, text, http), lambda: _remote_classify(model, text, http))
+    try:
+        if HF_HEDGE_BUDGET_MS > 0:
+            labels = await asyncio.wait_for(call, HF_HEDGE_BUDGET_MS / 1000)
+        else:
+            labels = await call
+    except asyncio.TimeoutError:
+        return None, FALLBACK_TIMEOUT
+    except (HuggingFaceError, httpx.HTTPError):
+        # Rejected or unreachable - the breaker has already counted it
+        return None, FALLBACK_UPSTREAM_ERROR
+    if labels is None:
+        return None, FALLBACK_MODEL_LOADING
+    return labels, None
+
+
+async def _remote_classify(model: str, text: str, http: HTTPClients) -> Optional[List[dict]]:
+    """Run one batched remote classification and record the outcome on the breaker"""
+    start = time.monotonic()
+    try:
+        labels = await huggingface_batcher.submit((model, http), text)
+    except Exception:
+        huggingface_breaker.record_failure(time.monotonic() - start)
+        raise
+
+    if labels is None:
+        # Cold model (503) counts against the backend
+        huggingface_breaker.record_failure(time.monotonic() - start)
+    else:
+        huggingface_breaker.record_success(time.monotonic() - start)
+    return labels
+
+
+class HuggingFaceError(Exception):
+    """An inference call answered with an error status; each batched item falls back on its own."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"HuggingFace API returned {status_code}: {detail}")
+        self.status_code = status_code
+
+
+async def _run_huggingface_batch(key: tuple, texts: List[str]) -> List[Any]:
+    """Send one batched inference call - the API returns one label list per input"""
+    model, http = key
+    client = http.client("huggingface")
+    headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"}
+
+    response = await client.post(
+        HUGGINGFACE_API_URL + model,
+        headers=headers,
+        json={"inputs": texts},
+    )
+
+    if response.status_code == 200:
+        return response.json()
+    elif response.status_code == 503:
+        return [None] * len(texts)
+    # One error per item, so a rejected batch doesn't fail every waiter with the same exception
+    return [HuggingFaceError(response.status_code, response.text) for _ in texts]
+
+
+huggingface_batcher = MicroBatcher(
+    _run_huggingface_batch,
+    max_batch_size=HF_BATCH_MAX_SIZE,
+    max_wait=HF_BATCH_MAX_WAIT_MS / 1000,
+)
+
+huggingface_flight = SingleFlight("huggingface", cancel_abandoned=False)
+
+huggingface_breaker = CircuitBreaker(
+    "huggingface",
+    window=HF_BREAKER_WINDOW,
+    error_rate=HF_BREAKER_ERROR_RATE,
+    slow_call=HF_BREAKER_SLOW_CALL_MS / 1000,
+    reset_timeout=HF_BREAKER_RESET_SECONDS,
+)
 
 
 @router.post("/analyze")
-async def analyze_text(request: TextAnalysisRequest) -> ConversationAnalysis:
+async def analyze_text(
+    request: TextAnalysisRequest,
+    http: HTTPClients = Depends(get_http_clients),
+) -> ConversationAnalysis:
     """
-    Full text analysis - emotions and sentiment
+    Full text analysis - emotions and sentiment, run concurrently under one deadline
     """
-    emotions = await analyze_emotions(request)
-    sentiments = await analyze_sentiment(request)
+    emotions_task = asyncio.ensure_future(_emotions(request.text, http))
+    sentiment_task = asyncio.ensure_future(_sentiments(request.text, http))
+    await asyncio.wait({emotions_task, sentiment_task}, timeout=ANALYSIS_DEADLINE)
+    
+    # Analyzers that missed the deadline, failed, or fell back on their own use the local scorer
+    fallback = []
+    emotions, reason = _result_or_fallback(emotions_task, lambda: _simple_emotion_analysis(request.text))
+    if reason:
+        fallback.append(f"emotions:{reason}")
+    sentiments, reason = _result_or_fallback(sentiment_task, lambda: _simple_sentiment_analysis(request.text))
+    if reason:
+        fallback.append(f"sentiment:{reason}")
     
     dominant_emotion = emotions[0] if emotions else EmotionResult(label="neutral", score=1.0)
     overall_sentiment = sentiments[0] if sentiments else SentimentResult(label="neutral", score=1.0)
@@ -146,15 +263,29 @@ async def analyze_text(request: TextAnalysisRequest) -> ConversationAnalysis:
         dominant_emotion=dominant_emotion,
         emotion_trend=emotions[:3],
         suggested_mood=suggested_mood,
+        fallback=fallback,
     )
 
 
-@router.post("/conversation")
-async def analyze_conversation(messages: List[dict]) -> ConversationAnalysis:
+def _result_or_fallback(task: asyncio.Future, fallback: Callable[[], list]) -> Tuple[list, Optional[str]]:
+    """Take a finished analyzer's (results, reason), or cancel it and use the fallback"""
+    if not task.done():
+        task.cancel()
+        return fallback(), FALLBACK_DEADLINE
+    if task.cancelled() or task.exception() is not None:
+        return fallback(), FALLBACK_ERROR
+    return task.result()
+
+
+@router.get("/conversation/{character_name}")
+async def analyze_conversation(character_name: str, world_id: Optional[str] = None) -> ConversationAnalysis:
     """
-    Analyze a conversation and return overall analysis
+    Conversation analysis from the character's running emotion state
+    (updated as each chat message is analyzed, see EmotionStateDB)
     """
-    if not messages:
+    state = EmotionStateDB.get(character_name)
+    current = state.get(world_id or "")
+    if not current:
         return ConversationAnalysis(
             overall_sentiment=SentimentResult(label="neutral", score=1.0),
             dominant_emotion=EmotionResult(label="neutral", score=1.0),
@@ -162,22 +293,58 @@ async def analyze_conversation(messages: List[dict]) -> ConversationAnalysis:
             suggested_mood="neutral",
         )
     
-    # Analyze last few messages
-    recent_messages = messages[-5:]
-    combined_text = " ".join([msg.get("content", "") for msg in recent_messages])
+    emotions = _normalized_emotions(current["scores"])
+    dominant_emotion = emotions[0] if emotions else EmotionResult(label="neutral", score=1.0)
+    
+    world_emotions = {}
+    for world, world_state in state.items():
+        if not world:
+            continue
+        world_ranked = _normalized_emotions(world_state["scores"])
+        if world_ranked:
+            world_emotions[world] = world_ranked[0].label
     
-    return await analyze_text(TextAnalysisRequest(text=combined_text))
+    return ConversationAnalysis(
+        overall_sentiment=_sentiment_from_emotions(emotions),
+        dominant_emotion=dominant_emotion,
+        emotion_trend=emotions[:3],
+        suggested_mood=_get_mood_for_emotion(dominant_emotion.label),
+        world_emotions=world_emotions,
+    )
+
+
+def _normalized_emotions(scores: Dict[str, float]) -> List[EmotionResult]:
+    """Decayed score vector -> emotions ranked by share of total"""
+    total = sum(scores.values())
+    if total <= 0:
+        return []
+    results = [EmotionResult(label=k, score=v / total) for k, v in scores.items()]
+    return sorted(results, key=lambda x: x.score, reverse=True)
+
+
+def _sentiment_from_emotions(emotions: List[EmotionResult]) -> SentimentResult:
+    """Collapse emotion shares into the strongest sentiment direction"""
+    totals = {"positive": 0.0, "negative": 0.0, "neutral": 0.0}
+    for emotion in emotions:
+        polarity = EMOTION_POLARITY.get(emotion.label, 0)
+        label = "positive" if polarity > 0 else "negative" if polarity < 0 else "neutral"
+        totals[label] += emotion.score
+    label = max(totals, key=totals.get)
+    return SentimentResult(label=label, score=totals[label])
+
+
+AVAILABLE_EMOTIONS_RESPONSE = register_static("emotions", {
+    "emotions": EMOTIONS,
+    "sentiments": SENTIMENTS,
+})
 
 
 @router.get("/emotions")
-async def get_available_emotions() -> dict:
+async def get_available_emotions(request: Request) -> Response:
     """
     Get list of available emotions
     """
-    return {
-        "emotions": EMOTIONS,
-        "sentiments": SENTIMENTS,
-    }
+    return AVAILABLE_EMOTIONS_RESPONSE(request)
 
 
 @router.post("/companion-response-emotion")
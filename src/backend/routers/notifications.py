@@ -1,8 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime
+from typing import Dict, Optional, List, Tuple
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from itertools import islice
+import asyncio
+import json
+import sqlite3
 import uuid
+from cache import TTLCache
+from database import NotificationDB
+from pubsub import Broker
 
 router = APIRouter()
 
@@ -18,8 +27,31 @@ NOTIFICATION_TYPES = {
     "reminder": {"icon": "⏰", "color": "yellow", "priority": "medium"},
 }
 
-# In-memory notification storage
-notifications_db = {}
+# Notifications kept per character; the purge job drops older ones beyond this
+MAX_NOTIFICATIONS_PER_CHARACTER = 50
+
+# Notifications older than this are purged regardless
+NOTIFICATION_TTL = timedelta(days=30)
+NOTIFICATION_PURGE_INTERVAL = 60 * 60  # seconds
+
+# Push channel: one publisher per worker fans new rows out to its open streams. Writes in
+# the same worker wake it at once; the poll only picks up rows written by other workers
+NOTIFICATION_POLL_INTERVAL = 5.0  # seconds
+NOTIFICATION_HEARTBEAT = 15.0  # seconds between keep-alive comments on idle streams
+NOTIFICATION_STREAM_BUFFER = 100  # undelivered notifications per connection before it catches up from the DB
+NOTIFICATION_FETCH_BATCH = 500
+NOTIFICATION_RETRY_MS = 3000  # client reconnect delay
+
+# Inboxes held in memory per worker. Writes made here update them in place; a write made by
+# another worker shows up once the inbox goes stale, the same delay the stream poll has
+NOTIFICATION_INBOX_TTL = NOTIFICATION_POLL_INTERVAL
+NOTIFICATION_INBOX_MAX = 5000  # characters
+
+notification_broker = Broker(max_pending=NOTIFICATION_STREAM_BUFFER)
+# Set by create_notification so streams in this worker don't wait for the next poll
+_notification_wakeup = asyncio.Event()
+# Last row seq the publisher has fanned out; None while no stream is open
+_publisher_state = {"seq": None}
 
 
 class Notification(BaseModel):
@@ -36,6 +68,129 @@ class Notification(BaseModel):
     data: Optional[dict] = None
 
 
+class Inbox:
+    """A character's newest notifications: newest-first deque, id index, unread index and unread total."""
+
+    __slots__ = ("items", "by_id", "unread", "unread_total", "complete")
+
+    def __init__(self, rows: List[dict], unread_total: int):
+        self.items: deque = deque(rows)
+        self.by_id: Dict[str, dict] = {n["id"]: n for n in rows}
+        # Unread ids in arrival order, so unread pages skip read items without a scan
+        self.unread: "OrderedDict[str, None]" = OrderedDict((n["id"], None) for n in reversed(rows) if not n["is_read"])
+        # Unread notifications in the table, including any older than the window
+        self.unread_total = unread_total
+        # False once the table may hold notifications older than the window
+        self.complete = len(rows) < MAX_NOTIFICATIONS_PER_CHARACTER
+
+    def add(self, notification: dict):
+        if len(self.items) >= MAX_NOTIFICATIONS_PER_CHARACTER:
+            oldest = self.items.pop()
+            del self.by_id[oldest["id"]]
+            self.unread.pop(oldest["id"], None)
+            self.complete = False
+        self.items.appendleft(notification)
+        self.by_id[notification["id"]] = notification
+        if not notification["is_read"]:
+            self.unread[notification["id"]] = None
+            self.unread_total += 1
+
+    def mark_read(self, notification_id: str) -> bool:
+        """False if the notification is not in the window."""
+        notification = self.by_id.get(notification_id)
+        if notification is None:
+            return False
+        if not notification["is_read"]:
+            notification["is_read"] = True
+            self.unread.pop(notification_id)
+            self.unread_total -= 1
+        return True
+
+    def mark_all_read(self):
+        for notification_id in self.unread:
+            self.by_id[notification_id]["is_read"] = True
+        self.unread.clear()
+        self.unread_total = 0
+
+    def page(self, offset: int, limit: int, unread_only: bool = False) -> Optional[List[dict]]:
+        """The requested page, or None if it reaches past what the window holds."""
+        if unread_only:
+            if offset + limit > len(self.unread) and len(self.unread) < self.unread_total:
+                return None
+            ids = islice(reversed(self.unread), offset, offset + limit)
+            return [self.by_id[notification_id] for notification_id in ids]
+        if offset + limit > len(self.items) and not self.complete:
+            return None
+        return list(islice(self.items, offset, offset + limit))
+
+
+class NotificationStore:
+    """Per-character inboxes in front of NotificationDB.
+
+    The table stays the source of truth: writes go to it first and then to any
+    inbox already loaded. Reads are served from the inbox, loaded with one query
+    on a miss; only pages past the newest MAX_NOTIFICATIONS_PER_CHARACTER go to
+    the table.
+    """
+
+    def __init__(self, ttl: float = NOTIFICATION_INBOX_TTL, max_inboxes: int = NOTIFICATION_INBOX_MAX):
+        self._inboxes = TTLCache(ttl=ttl, max_entries=max_inboxes)
+
+    def _load(self, character_name: str) -> Inbox:
+        inbox = self._inboxes.get(character_name)
+        if inbox is None:
+            inbox = Inbox(*NotificationDB.get_inbox(character_name, MAX_NOTIFICATIONS_PER_CHARACTER))
+            self._inboxes.set(character_name, inbox)
+        return inbox
+
+    def page(self, character_name: str, limit: int = 20, offset: int = 0,
+             unread_only: bool = False) -> Tuple[List[dict], int]:
+        """A page of notifications and the unread count."""
+        inbox = self._load(character_name)
+        notifications = inbox.page(offset, limit, unread_only)
+        if notifications is None:
+            notifications = NotificationDB.get_page(character_name, limit, offset, unread_only)
+        return notifications, inbox.unread_total
+
+    def add_many(self, notifications: List[dict]):
+        NotificationDB.add_many(notifications)
+        for notification in notifications:
+            inbox = self._inboxes.get(notification["character_name"])
+            if inbox is not None:
+                inbox.add(notification)
+
+    def mark_read(self, character_name: str, notification_id: str) -> bool:
+        if not NotificationDB.mark_read(character_name, notification_id):
+            return False
+        inbox = self._inboxes.get(character_name)
+        if inbox is not None and not inbox.mark_read(notification_id):
+            # Older than the window - its effect on the unread total is unknown here
+            self._inboxes.pop(character_name)
+        return True
+
+    def mark_all_read(self, character_name: str):
+        NotificationDB.mark_all_read(character_name)
+        inbox = self._inboxes.get(character_name)
+        if inbox is not None:
+            inbox.mark_all_read()
+
+    def clear(self, character_name: str, read_only: bool = False):
+        NotificationDB.clear(character_name, read_only=read_only)
+        self._inboxes.pop(character_name)
+
+    def purge(self, older_than: str, max_per_character: int) -> int:
+        deleted = NotificationDB.purge(older_than, max_per_character)
+        if deleted:
+            self._inboxes = TTLCache(ttl=self._inboxes.ttl, max_entries=self._inboxes.max_entries)
+        return deleted
+
+    def stats(self) -> dict:
+        return self._inboxes.stats()
+
+
+notification_store = NotificationStore()
+
+
 class NotificationCreate(BaseModel):
     character_name: str
     type: str
@@ -44,14 +199,13 @@ class NotificationCreate(BaseModel):
     data: Optional[dict] = None
 
 
-def create_notification(
+def _build_notification(
     character_name: str,
     type: str,
     title: str,
     message: str,
     data: dict = None,
 ) -> Notification:
-    """Create a notification with type-based icon and color."""
     type_info = NOTIFICATION_TYPES.get(type, {
         "icon": "🔔",
         "color": "purple",
@@ -70,35 +224,158 @@ def create_notification(
         created_at=datetime.now().isoformat(),
         data=data,
     )
-    
-    if character_name not in notifications_db:
-        notifications_db[character_name] = []
-    
-    notifications_db[character_name].insert(0, notification)
-    
-    # Keep only last 50 notifications per character
-    if len(notifications_db[character_name]) > 50:
-        notifications_db[character_name] = notifications_db[character_name][:50]
-    
     return notification
 
 
+def create_notification(
+    character_name: str,
+    type: str,
+    title: str,
+    message: str,
+    data: dict = None,
+) -> Notification:
+    """Create a notification with type-based icon and color."""
+    notification = _build_notification(character_name, type, title, message, data)
+    notification_store.add_many([notification.model_dump()])
+    _notification_wakeup.set()
+    return notification
+
+
+def create_notifications(entries: List[NotificationCreate]) -> List[Notification]:
+    """Create several notifications in one write."""
+    notifications = [
+        _build_notification(e.character_name, e.type, e.title, e.message, e.data)
+        for e in entries
+    ]
+    notification_store.add_many([n.model_dump() for n in notifications])
+    _notification_wakeup.set()
+    return notifications
+
+
+async def notification_purge_loop():
+    """Background job started in the app lifespan - keeps the notifications table small"""
+    while True:
+        cutoff = (datetime.now() - NOTIFICATION_TTL).isoformat()
+        notification_store.purge(cutoff, MAX_NOTIFICATIONS_PER_CHARACTER)
+        await asyncio.sleep(NOTIFICATION_PURGE_INTERVAL)
+
+
+async def notification_stream_loop():
+    """Background job started in the app lifespan - publishes rows written by any worker to local streams
+
+    Idle ticks (no open streams) make no queries; each stream sets the starting point via _follow_from.
+    """
+    while True:
+        try:
+            await asyncio.wait_for(_notification_wakeup.wait(), timeout=NOTIFICATION_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _notification_wakeup.clear()
+        if not notification_broker.has_subscribers():
+            _publisher_state["seq"] = None
+            continue
+        while _publisher_state["seq"] is not None:
+            try:
+                batch = NotificationDB.get_since(_publisher_state["seq"], limit=NOTIFICATION_FETCH_BATCH)
+            except sqlite3.OperationalError:
+                # Database busy - try again on the next tick
+                break
+            for notification in batch:
+                _publisher_state["seq"] = notification["seq"]
+                notification_broker.publish(notification["character_name"], notification)
+            if len(batch) < NOTIFICATION_FETCH_BATCH:
+                break
+
+
+def _follow_from(seq: int):
+    """Move the publisher back to seq so nothing after it is skipped (streams drop repeats)."""
+    current = _publisher_state["seq"]
+    if current is None or seq < current:
+        _publisher_state["seq"] = seq
+
+
+def _missed_notifications(character_name: str, last_seq: int) -> List[dict]:
+    """Everything for the character after last_seq, read from the table."""
+    missed = []
+    while True:
+        batch = NotificationDB.get_since(last_seq, character_name, limit=NOTIFICATION_FETCH_BATCH)
+        missed.extend(batch)
+        if len(batch) < NOTIFICATION_FETCH_BATCH:
+            return missed
+        last_seq = batch[-1]["seq"]
+
+
+def _sse_event(notification: dict) -> str:
+    return f"id: {notification['seq']}\nevent: notification\ndata: {json.dumps(notification)}\n\n"
+
+
+async def _notification_events(character_name: str, last_seq: Optional[int]):
+    subscription = notification_broker.subscribe(character_name)
+    try:
+        yield f"retry: {NOTIFICATION_RETRY_MS}\n\n"
+        if last_seq is None:
+            last_seq = NotificationDB.last_seq()
+            _follow_from(last_seq)
+        else:
+            # Resume: replay what was missed while disconnected; the publisher takes over after it
+            missed = _missed_notifications(character_name, last_seq)
+            _follow_from(missed[-1]["seq"] if missed else last_seq)
+            for notification in missed:
+                last_seq = notification["seq"]
+                yield _sse_event(notification)
+
+        while True:
+            if subscription.overflowed:
+                # Fell behind - drop the queue and catch up from the table
+                subscription.overflowed = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                for notification in _missed_notifications(character_name, last_seq):
+                    last_seq = notification["seq"]
+                    yield _sse_event(notification)
+                continue
+            try:
+                notification = await asyncio.wait_for(subscription.queue.get(), timeout=NOTIFICATION_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if notification["seq"] <= last_seq:
+                continue
+            last_seq = notification["seq"]
+            yield _sse_event(notification)
+    finally:
+        notification_broker.unsubscribe(subscription)
+
+
+@router.get("/{character_name}/stream")
+async def stream_notifications(
+    character_name: str,
+    since: Optional[int] = Query(None, ge=0, description="Resume after this event id"),
+    last_event_id: Optional[str] = Header(None),
+):
+    """Push a character's new notifications as Server-Sent Events.
+
+    Browsers resume automatically by sending Last-Event-ID on reconnect.
+    """
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        _notification_events(character_name, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{character_name}")
 async def get_notifications(
     character_name: str,
     unread_only: bool = False,
-    limit: int = 20,
+    limit: int = Query(20, ge=1, le=MAX_NOTIFICATIONS_PER_CHARACTER),
+    offset: int = Query(0, ge=0),
 ):
     """Get notifications for a character."""
-    character_notifications = notifications_db.get(character_name, [])
-    
-    if unread_only:
-        character_notifications = [n for n in character_notifications if not n.is_read]
-    
-    return {
-        "notifications": character_notifications[:limit],
-        "unread_count": len([n for n in character_notifications if not n.is_read]),
-    }
+    page, unread_count = notification_store.page(character_name, limit, offset, unread_only)
+    return {"notifications": page, "unread_count": unread_count}
 
 
 @router.post("/")
@@ -113,15 +390,17 @@ async def create_notification_endpoint(data: NotificationCreate):
     )
 
 
+@router.post("/bulk")
+async def create_notifications_endpoint(entries: List[NotificationCreate]):
+    """Create several notifications at once."""
+    return create_notifications(entries)
+
+
 @router.post("/{notification_id}/read")
 async def mark_notification_read(notification_id: str, character_name: str):
     """Mark a notification as read."""
-    character_notifications = notifications_db.get(character_name, [])
-    
-    for notification in character_notifications:
-        if notification.id == notification_id:
-            notification.is_read = True
-            return {"success": True}
+    if notification_store.mark_read(character_name, notification_id):
+        return {"success": True}
     
     raise HTTPException(status_code=404, detail="Notification not found")
 
@@ -129,10 +408,7 @@ async def mark_notification_read(notification_id: str, character_name: str):
 @router.post("/{character_name}/mark_all_read")
 async def mark_all_read(character_name: str):
     """Mark all notifications as read."""
-    character_notifications = notifications_db.get(character_name, [])
-    
-    for notification in character_notifications:
-        notification.is_read = True
+    notification_store.mark_all_read(character_name)
     
     return {"success": True}
 
@@ -140,12 +416,8 @@ async def mark_all_read(character_name: str):
 @router.delete("/{character_name}")
 async def clear_notifications(character_name: str, unread_only: bool = False):
     """Clear notifications."""
-    if unread_only:
-        notifications_db[character_name] = [
-            n for n in notifications_db.get(character_name, []) if not n.is_read
-        ]
-    else:
-        notifications_db[character_name] = []
+    # unread_only keeps the unread notifications and drops the read ones
+    notification_store.clear(character_name, read_only=unread_only)
     
     return {"success": True}
 
@@ -1,13 +1,56 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query, Request
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List
+import asyncio
+import os
+import time
+import unicodedata
 import httpx
-import urllib.parse
+from database import GeocodeCacheDB, ReverseGeocodeCacheDB
+from geo import SpatialIndex, geohash_encode, geohash_neighbors, haversine_km
+from http_client import HTTPClients, get_http_clients
+from prefix_index import PrefixIndex
+from responses import register_static
+from scheduler import BACKGROUND, INTERACTIVE, RateLimitedScheduler, SchedulerBusy
 
 router = APIRouter()
 
 OSM_BASE_URL = "https://nominatim.openstreetmap.org"
 
+# Nominatim usage policy: at most one request per second
+NOMINATIM_MIN_INTERVAL = float(os.getenv("NOMINATIM_MIN_INTERVAL", "1.0"))
+NOMINATIM_MAX_QUEUE = int(os.getenv("NOMINATIM_MAX_QUEUE", "20"))
+# Longest a request may wait for its slot before we answer from cache instead
+NOMINATIM_MAX_WAIT = float(os.getenv("NOMINATIM_MAX_WAIT", "3.0"))
+
+GEOCODE_CACHE_TTL = 30 * 24 * 60 * 60  # seconds
+GEOCODE_FETCH_LIMIT = 10  # smaller requests are fetched at this size so they share cache entries
+
+# Reverse-geocode cache: geohash precision 7 cells are about 150m across
+REVERSE_GEOCODE_PRECISION = int(os.getenv("REVERSE_GEOCODE_PRECISION", "7"))
+REVERSE_GEOCODE_MAX_ENTRIES = int(os.getenv("REVERSE_GEOCODE_MAX_ENTRIES", "50000"))
+REVERSE_GEOCODE_TTL = 30 * 24 * 60 * 60  # seconds
+REVERSE_GEOCODE_SERVE_STALE = os.getenv("REVERSE_GEOCODE_SERVE_STALE", "true").lower() == "true"
+
+_reverse_stats = {"hits": 0, "approximate_hits": 0, "stale_hits": 0, "misses": 0}
+_reverse_refresh_tasks = set()
+
+# Curated and geocoded places for /places/nearby and /autocomplete, built lazily after the DB is initialized
+place_index = SpatialIndex(precision=3)
+name_index = PrefixIndex()
+_place_index_state = {"built": False}
+
+# Autocomplete ranking weights: curated places outrank anything seen in search results
+POPULAR_PLACE_POPULARITY = 100.0
+GEOCODE_RESULT_POPULARITY = 1.0
+
+nominatim_scheduler = RateLimitedScheduler(
+    "nominatim",
+    min_interval=NOMINATIM_MIN_INTERVAL,
+    max_queue=NOMINATIM_MAX_QUEUE,
+    max_wait=NOMINATIM_MAX_WAIT,
+)
+
 
 class SearchParams(BaseModel):
     query: str
@@ -25,192 +68,391 @@ class LocationResult(BaseModel):
     type: str
 
 
+def normalize_query(q: str) -> str:
+    """Cache key for a free-text query: case-folded, whitespace-collapsed, edge punctuation dropped."""
+    return " ".join(unicodedata.normalize("NFKC", q).casefold().split()).strip(" ,.;:!?")
+
+
+def _search_result(item: dict) -> dict:
+    return {
+        "place_id": item.get("place_id", 0),
+        "osm_id": item.get("osm_id", 0),
+        "lat": item.get("lat", ""),
+        "lon": item.get("lon", ""),
+        "display_name": item.get("display_name", ""),
+        "class": item.get("class", ""),
+        "type": item.get("type", ""),
+        "address": item.get("address", {}),
+    }
+
+
+def _popular_matches(query: str, limit: int) -> List[dict]:
+    """Curated places whose name or location contains the query - a partial answer when Nominatim is busy."""
+    return [
+        {
+            "place_id": 0,
+            "osm_id": 0,
+            "lat": place["lat"],
+            "lon": place["lon"],
+            "display_name": f"{place['name']}, {place['location']}",
+            "class": "tourism",
+            "type": place["category"],
+            "address": {},
+        }
+        for place in POPULAR_PLACES
+        if query in place["name"].casefold() or query in place["location"].casefold()
+    ][:limit]
+
+
+async def _fetch_search(http: HTTPClients, query: str, limit: int) -> Optional[List[dict]]:
+    client = http.client("nominatim")
+    response = await client.get(f"{OSM_BASE_URL}/search", params={
+        "q": query,
+        "format": "json",
+        "limit": limit,
+        "addressdetails": 1,
+    })
+    if response.status_code != 200:
+        return None
+    results = [_search_result(item) for item in response.json()]
+    GeocodeCacheDB.put(query, results, limit)
+    if _place_index_state["built"]:
+        _index_geocode_results(results)
+    return results
+
+
 @router.get("/search")
 async def search_location(
     q: str,
-    limit: int = 10,
-    format: str = "json",
+    limit: int = Query(10, ge=1, le=50),
+    http: HTTPClients = Depends(get_http_clients),
 ):
-    """Search for a location using OpenStreetMap Nominatim."""
+    """Search for a location using OpenStreetMap Nominatim.
+
+    Answered from the geocode cache when possible; upstream calls go through
+    the rate-limited Nominatim scheduler.
+    """
+    query = normalize_query(q)
+    if not query:
+        return {"results": []}
+
+    cached = GeocodeCacheDB.get(query)
+    # A cached answer covers this request if it was fetched with at least this limit, or was exhaustive
+    covers = cached is not None and (
+        cached["result_limit"] >= limit or len(cached["results"]) < cached["result_limit"]
+    )
+    if covers and time.time() - cached["fetched_at"] < GEOCODE_CACHE_TTL:
+        return {"results": cached["results"][:limit]}
+
+    fetch_limit = max(limit, GEOCODE_FETCH_LIMIT)
+    error = "Failed to fetch location data"
     try:
-        encoded_query = urllib.parse.quote(q)
-        url = f"{OSM_BASE_URL}/search"
-        params = {
-            "q": q,
-            "format": format,
-            "limit": limit,
-            "addressdetails": 1,
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                for item in data:
-                    results.append({
-                        "place_id": item.get("place_id", 0),
-                        "osm_id": item.get("osm_id", 0),
-                        "lat": item.get("lat", ""),
-                        "lon": item.get("lon", ""),
-                        "display_name": item.get("display_name", ""),
-                        "class": item.get("class", ""),
-                        "type": item.get("type", ""),
-                        "address": item.get("address", {}),
-                    })
-                return {"results": results}
-            return {"error": "Failed to fetch location data"}
-    except Exception as e:
-        return {"error": str(e)}
+        results = await nominatim_scheduler.submit(
+            ("search", query, fetch_limit),
+            lambda: _fetch_search(http, query, fetch_limit),
+            priority=INTERACTIVE,
+        )
+    except (SchedulerBusy, httpx.HTTPError):
+        results = None
+    except (ValueError, KeyError, TypeError) as e:
+        # Unparseable upstream answer
+        results = None
+        error = str(e)
+
+    if results is not None:
+        return {"results": results[:limit]}
+    if cached is not None:
+        return {"results": cached["results"][:limit], "stale": True}
+    partial = _popular_matches(query, limit)
+    if partial:
+        return {"results": partial, "partial": True}
+    return {"error": error}
+
+
+async def _fetch_reverse(http: HTTPClients, lat: float, lon: float, cell: str) -> Optional[dict]:
+    client = http.client("nominatim")
+    response = await client.get(f"{OSM_BASE_URL}/reverse", params={
+        "lat": lat,
+        "lon": lon,
+        "format": "json",
+        "addressdetails": 1,
+    })
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    result = {
+        "place_id": data.get("place_id", 0),
+        "lat": data.get("lat", ""),
+        "lon": data.get("lon", ""),
+        "display_name": data.get("display_name", ""),
+        "address": data.get("address", {}),
+    }
+    ReverseGeocodeCacheDB.put(cell, lat, lon, result, REVERSE_GEOCODE_MAX_ENTRIES)
+    return result
+
+
+async def _refresh_reverse(http: HTTPClients, lat: float, lon: float, cell: str):
+    """Background revalidation of a stale cell, behind interactive requests in the queue."""
+    try:
+        await nominatim_scheduler.submit(
+            ("reverse", cell),
+            lambda: _fetch_reverse(http, lat, lon, cell),
+            priority=BACKGROUND,
+        )
+    except (SchedulerBusy, httpx.HTTPError, ValueError):
+        pass
+
+
+def _closest_cached(lat: float, lon: float, cell: str, entries: Dict[str, dict]) -> Optional[dict]:
+    """The exact cell's entry, else the neighbouring entry nearest the coordinate."""
+    if cell in entries:
+        return entries[cell]
+    if not entries:
+        return None
+    return min(entries.values(), key=lambda e: haversine_km(lat, lon, e["lat"], e["lon"]))
 
 
 @router.get("/reverse")
 async def reverse_geocode(
-    lat: str,
-    lon: str,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    approximate: bool = Query(True, description="Accept a cached result from a neighbouring cell"),
+    allow_stale: bool = Query(REVERSE_GEOCODE_SERVE_STALE, description="Serve expired entries while refreshing"),
+    http: HTTPClients = Depends(get_http_clients),
 ):
-    """Reverse geocode coordinates to get address."""
+    """Reverse geocode coordinates to get address.
+
+    Results are cached per geohash cell (REVERSE_GEOCODE_PRECISION), so taps
+    near the same spot share one Nominatim lookup.
+    """
+    cell = geohash_encode(lat, lon, REVERSE_GEOCODE_PRECISION)
+    cells = geohash_neighbors(lat, lon, REVERSE_GEOCODE_PRECISION) if approximate else [cell]
+    cached = _closest_cached(lat, lon, cell, ReverseGeocodeCacheDB.get_many(cells))
+
+    if cached is not None:
+        fresh = time.time() - cached["fetched_at"] < REVERSE_GEOCODE_TTL
+        if fresh or allow_stale:
+            _reverse_stats["hits" if cached["geohash"] == cell else "approximate_hits"] += 1
+            if not fresh:
+                _reverse_stats["stale_hits"] += 1
+                task = asyncio.ensure_future(_refresh_reverse(http, cached["lat"], cached["lon"], cached["geohash"]))
+                _reverse_refresh_tasks.add(task)
+                task.add_done_callback(_reverse_refresh_tasks.discard)
+            return _reverse_response(cached["result"], cached=True, approximate=cached["geohash"] != cell, stale=not fresh)
+
+    _reverse_stats["misses"] += 1
     try:
-        url = f"{OSM_BASE_URL}/reverse"
-        params = {
-            "lat": lat,
-            "lon": lon,
-            "format": "json",
-            "addressdetails": 1,
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "place_id": data.get("place_id", 0),
-                    "lat": data.get("lat", ""),
-                    "lon": data.get("lon", ""),
-                    "display_name": data.get("display_name", ""),
-                    "address": data.get("address", {}),
-                }
-            return {"error": "Failed to fetch address"}
-    except Exception as e:
+        result = await nominatim_scheduler.submit(
+            ("reverse", cell),
+            lambda: _fetch_reverse(http, lat, lon, cell),
+            priority=INTERACTIVE,
+        )
+    except SchedulerBusy as e:
+        if cached is not None:
+            return _reverse_response(cached["result"], cached=True, approximate=cached["geohash"] != cell, stale=True)
+        return {"error": "Geocoder is busy, try again shortly", "retry_after": round(e.estimated_wait, 1)}
+    except (httpx.HTTPError, ValueError) as e:
+        if cached is not None:
+            return _reverse_response(cached["result"], cached=True, approximate=cached["geohash"] != cell, stale=True)
         return {"error": str(e)}
+    if result is None:
+        return {"error": "Failed to fetch address"}
+    return _reverse_response(result, cached=False, approximate=False, stale=False)
+
+
+def _reverse_response(result: dict, cached: bool, approximate: bool, stale: bool) -> dict:
+    """A reverse-geocode result with the cache flags every response carries."""
+    return {**result, "cached": cached, "approximate": approximate, "stale": stale}
+
+
+def reverse_cache_stats() -> dict:
+    lookups = sum(_reverse_stats[k] for k in ("hits", "approximate_hits", "misses"))
+    hits = _reverse_stats["hits"] + _reverse_stats["approximate_hits"]
+    return {
+        **_reverse_stats,
+        "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        "entries": ReverseGeocodeCacheDB.count(),
+        "max_entries": REVERSE_GEOCODE_MAX_ENTRIES,
+        "precision": REVERSE_GEOCODE_PRECISION,
+    }
+
+
+# Curated places shown on the Earth World landing screen
+POPULAR_PLACES = [
+    {
+        "name": "Eiffel Tower",
+        "location": "Paris, France",
+        "lat": "48.8584",
+        "lon": "2.2945",
+        "description": "Iconic iron lattice tower on the Champ de Mars.",
+        "category": "landmark",
+    },
+    {
+        "name": "Great Wall of China",
+        "location": "China",
+        "lat": "40.4319",
+        "lon": "116.5704",
+        "description": "Ancient series of walls and fortifications.",
+        "category": "landmark",
+    },
+    {
+        "name": "Machu Picchu",
+        "location": "Peru",
+        "lat": "-13.1631",
+        "lon": "-72.5450",
+        "description": "15th-century Inca citadel in the Andes.",
+        "category": "heritage",
+    },
+    {
+        "name": "Taj Mahal",
+        "location": "Agra, India",
+        "lat": "27.1751",
+        "lon": "78.0421",
+        "description": "Ivory-white marble mausoleum on the Yamuna River.",
+        "category": "landmark",
+    },
+    {
+        "name": "Grand Canyon",
+        "location": "Arizona, USA",
+        "lat": "36.1069",
+        "lon": "-112.1129",
+        "description": "Steep-sided canyon carved by the Colorado River.",
+        "category": "nature",
+    },
+    {
+        "name": "Mount Everest",
+        "location": "Nepal/Tibet",
+        "lat": "27.9881",
+        "lon": "86.9250",
+        "description": "Earth's highest mountain above sea level.",
+        "category": "mountain",
+    },
+    {
+        "name": "Amazon Rainforest",
+        "location": "South America",
+        "lat": "-3.4653",
+        "lon": "-62.2159",
+        "description": "World's largest tropical rainforest.",
+        "category": "nature",
+    },
+    {
+        "name": "Colosseum",
+        "location": "Rome, Italy",
+        "lat": "41.8902",
+        "lon": "12.4922",
+        "description": "Ancient oval amphitheatre in Rome.",
+        "category": "heritage",
+    },
+    {
+        "name": "Santorini",
+        "location": "Greece",
+        "lat": "36.3932",
+        "lon": "25.4615",
+        "description": "Volcanic island in the southern Aegean Sea.",
+        "category": "island",
+    },
+    {
+        "name": "Serengeti",
+        "location": "Tanzania",
+        "lat": "-2.3333",
+        "lon": "34.8333",
+        "description": "Large savanna ecosystem in Tanzania.",
+        "category": "nature",
+    },
+]
+
+POPULAR_PLACES_RESPONSE = register_static("popular_places", {"places": POPULAR_PLACES})
 
 
 @router.get("/places/popular")
-async def get_popular_places():
+async def get_popular_places(request: Request):
     """Get popular places to explore."""
-    popular_places = [
-        {
-            "name": "Eiffel Tower",
-            "location": "Paris, France",
-            "lat": "48.8584",
-            "lon": "2.2945",
-            "description": "Iconic iron lattice tower on the Champ de Mars.",
-            "category": "landmark",
-        },
-        {
-            "name": "Great Wall of China",
-            "location": "China",
-            "lat": "40.4319",
-            "lon": "116.5704",
-            "description": "Ancient series of walls and fortifications.",
-            "category": "landmark",
-        },
-        {
-            "name": "Machu Picchu",
-            "location": "Peru",
-            "lat": "-13.1631",
-            "lon": "-72.5450",
-            "description": "15th-century Inca citadel in the Andes.",
-            "category": "heritage",
-        },
-        {
-            "name": "Taj Mahal",
-            "location": "Agra, India",
-            "lat": "27.1751",
-            "lon": "78.0421",
-            "description": "Ivory-white marble mausoleum on the Yamuna River.",
-            "category": "landmark",
-        },
-        {
-            "name": "Grand Canyon",
-            "location": "Arizona, USA",
-            "lat": "36.1069",
-            "lon": "-112.1129",
-            "description": "Steep-sided canyon carved by the Colorado River.",
-            "category": "nature",
-        },
-        {
-            "name": "Mount Everest",
-            "location": "Nepal/Tibet",
-            "lat": "27.9881",
-            "lon": "86.9250",
-            "description": "Earth's highest mountain above sea level.",
-            "category": "mountain",
-        },
-        {
-            "name": "Amazon Rainforest",
-            "location": "South America",
-            "lat": "-3.4653",
-            "lon": "-62.2159",
-            "description": "World's largest tropical rainforest.",
-            "category": "nature",
-        },
-        {
-            "name": "Colosseum",
-            "location": "Rome, Italy",
-            "lat": "41.8902",
-            "lon": "12.4922",
-            "description": "Ancient oval amphitheatre in Rome.",
-            "category": "heritage",
-        },
-        {
-            "name": "Santorini",
-            "location": "Greece",
-            "lat": "36.3932",
-            "lon": "25.4615",
-            "description": "Volcanic island in the southern Aegean Sea.",
-            "category": "island",
-        },
-        {
-            "name": "Serengeti",
-            "location": "Tanzania",
-            "lat": "-2.3333",
-            "lon": "34.8333",
-            "description": "Large savanna ecosystem in Tanzania.",
-            "category": "nature",
-        },
-    ]
-    return {"places": popular_places}
+    return POPULAR_PLACES_RESPONSE(request)
+
+
+def _index_key(result: dict) -> tuple:
+    if result.get("osm_id"):
+        return ("osm", result["osm_id"])
+    return ("name", result.get("display_name", ""))
+
+
+def _index_geocode_results(results: List[dict]):
+    """Add forward-geocode results to the nearby-place index."""
+    for result in results:
+        try:
+            lat, lon = float(result["lat"]), float(result["lon"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        display_name = result.get("display_name", "")
+        key = _index_key(result)
+        place = {
+            "name": display_name.split(",")[0],
+            "location": display_name,
+            "lat": lat,
+            "lon": lon,
+            "category": result.get("type", ""),
+            "class": result.get("class", ""),
+            "type": result.get("type", ""),
+            "source": "geocode",
+        }
+        place_index.add(key, place)
+        # Each cached query that returned the place counts toward its ranking
+        name_index.add(key, place["name"], place, score=GEOCODE_RESULT_POPULARITY)
+
+
+def _ensure_place_index():
+    """Build the place indexes on first use from the curated places and the geocode cache."""
+    if _place_index_state["built"]:
+        return
+    for place in POPULAR_PLACES:
+        indexed = {
+            **place,
+            "lat": float(place["lat"]),
+            "lon": float(place["lon"]),
+            "source": "popular",
+        }
+        place_index.add(("popular", place["name"]), indexed)
+        name_index.add(("popular", place["name"]), place["name"], indexed, score=POPULAR_PLACE_POPULARITY)
+    _index_geocode_results(GeocodeCacheDB.all_results())
+    _place_index_state["built"] = True
+
+
+@router.get("/autocomplete")
+async def autocomplete_places(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(8, ge=1, le=20),
+):
+    """Suggest place names as the user types.
+
+    Answered only from the in-memory name index (curated places plus every
+    cached search result); use /search to go to Nominatim.
+    """
+    _ensure_place_index()
+    return {"suggestions": name_index.search(q, limit)}
 
 
 @router.get("/places/nearby")
 async def get_nearby_places(
-    lat: str,
-    lon: str,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
     category: str = None,
+    radius_km: Optional[float] = Query(None, gt=0, le=20000, description="Only places within this distance"),
+    limit: int = Query(10, ge=1, le=100),
 ):
-    """Get nearby places based on coordinates."""
-    try:
-        url = f"{OSM_BASE_URL}/search"
-        params = {
-            "lat": lat,
-            "lon": lon,
-            "format": "json",
-            "zoom": 10,
-            "limit": 20,
-        }
-        
-        if category:
-            params["q"] = category
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                return {"places": data[:10]}
-            return {"error": "Failed to fetch nearby places"}
-    except Exception as e:
-        return {"error": str(e)}
+    """Get nearby places based on coordinates.
+
+    Answered from the in-process index of curated and previously geocoded
+    places: the nearest `limit` places, optionally within radius_km.
+    """
+    _ensure_place_index()
+    category = category.lower() if category else None
+    if radius_km is not None:
+        found = place_index.within(lat, lon, radius_km, category, limit=limit)
+    else:
+        found = place_index.nearest(lat, lon, limit, category)
+    return {
+        "places": [{**place, "distance_km": round(distance, 3)} for distance, place in found],
+    }
 
 
 # Earth world facts for AI responses
@@ -3,11 +3,23 @@ Wikipedia API Router for Earth World Exploration
 Provides endpoints for searching and retrieving Wikipedia articles
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Deque, List, Optional, Tuple
+from collections import deque
+import asyncio
+import json
+import re
+import time
 import httpx
-import xml.etree.ElementTree as ET
+from article_store import ArticleStore
+from cache import TTLCache
+from http_client import HTTPClients, get_http_clients
+from responses import conditional_json_response
+from singleflight import SingleFlight
+from wikitext import wikitext_to_plaintext
 
 router = APIRouter(prefix="/wikipedia", tags=["Wikipedia"])
 
@@ -22,6 +34,34 @@ EXPLORATION_CATEGORIES = [
     "Art", "Philosophy", "Physics", "Biology", "Astronomy"
 ]
 
+# Featured topics (title, category, description), resolved to page IDs and thumbnails
+FEATURED_TOPICS = [
+    ("Solar System", "Science", "Explore our cosmic neighborhood"),
+    ("Ancient Egypt", "History", "Discover the mysteries of the pharaohs"),
+    ("Human Brain", "Science", "Unlock the secrets of consciousness"),
+    ("World War II", "History", "Learn about the pivotal global conflict"),
+    ("Machine Learning", "Technology", "Dive into the world of AI"),
+    ("Ocean", "Nature", "Explore Earth's final frontier"),
+    ("Renaissance", "Culture", "Experience the rebirth of art and science"),
+    ("Quantum Physics", "Science", "Journey into the subatomic realm"),
+    ("Amazon Rainforest", "Nature", "Discover the lungs of our planet"),
+    ("Space Exploration", "Science", "Trace humanity's journey to the stars"),
+]
+FEATURED_TTL = 6 * 60 * 60  # seconds
+
+# Article cache - entries past their TTL are revalidated by revision ID
+ARTICLE_TTL = 30 * 60  # seconds
+ARTICLE_CACHE_SIZE = 500
+
+# Local index answers a search when it has at least this many fresh hits
+LOCAL_SEARCH_MIN_HITS = 3
+
+SECTION_HEADING = re.compile(r"^=+\s*(.*?)\s*=+\s*$", re.MULTILINE)
+
+# Pre-fetched random articles, refilled in the background as they are served
+RANDOM_POOL_SIZE = 40
+RANDOM_FETCH_CONCURRENCY = 5
+
 
 class WikipediaSearchResult(BaseModel):
     """Model for Wikipedia search result"""
@@ -43,6 +83,32 @@ class WikipediaArticle(BaseModel):
     related_pages: List[str] = []
 
 
+class ArticleSection(BaseModel):
+    """Heading entry in an article outline"""
+    index: int
+    title: str
+    level: int
+
+
+class ArticleOutline(BaseModel):
+    """Intro and section headings - section bodies are loaded separately"""
+    title: str
+    pageid: int
+    url: str
+    revid: int
+    intro: str
+    thumbnail: Optional[str] = None
+    sections: List[ArticleSection] = []
+
+
+class SectionContent(BaseModel):
+    """Plaintext body of one article section"""
+    pageid: int
+    index: int
+    title: str
+    text: str
+
+
 class FeaturedTopic(BaseModel):
     """Model for featured exploration topic"""
     title: str
@@ -52,330 +118,682 @@ class FeaturedTopic(BaseModel):
     pageid: int
 
 
+_random_pool: Deque[WikipediaArticle] = deque(maxlen=RANDOM_POOL_SIZE)
+_random_refill_task: Optional[asyncio.Task] = None
+
+# pageid -> (article, lastrevid)
+_article_cache = TTLCache(ttl=ARTICLE_TTL, max_entries=ARTICLE_CACHE_SIZE)
+_article_flight = SingleFlight("wikipedia-article")
+
+# Outline and section responses (encoded JSON, keyed by pageid / (pageid, index))
+_outline_cache = TTLCache(ttl=ARTICLE_TTL, max_entries=ARTICLE_CACHE_SIZE)
+_section_cache = TTLCache(ttl=ARTICLE_TTL, max_entries=ARTICLE_CACHE_SIZE * 4)
+
+# Encoded featured-topics JSON, shared by /featured and /trending
+_featured = {"body": None, "expires": 0.0}
+_featured_refresh_task: Optional[asyncio.Task] = None
+
+
 @router.get("/search")
 async def search_wikipedia(
     query: str = Query(..., description="Search query"),
-    limit: int = Query(10, ge=1, le=50, description="Maximum results")
+    limit: int = Query(10, ge=1, le=50, description="Maximum results"),
+    refresh: bool = Query(False, description="Skip the local index and search Wikipedia"),
+    http: HTTPClients = Depends(get_http_clients),
 ) -> List[WikipediaSearchResult]:
     """
-    Search Wikipedia articles
+    Search Wikipedia articles - answered from the local article index when it has enough fresh hits
     """
-    async with httpx.AsyncClient() as client:
-        params = {
-            "action": "query",
-            "list": "search",
-            "srsearch": query,
-            "srlimit": limit,
-            "format": "json",
-            "origin": "*"
-        }
+    if not refresh:
+        local = ArticleStore.search(query, limit)
+        if len(local) >= min(limit, LOCAL_SEARCH_MIN_HITS):
+            return [
+                WikipediaSearchResult(
+                    title=row["title"],
+                    snippet=row["snippet"],
+                    pageid=row["pageid"],
+                    url=f"{WIKIPEDIA_PAGE_URL}{row['title'].replace(' ', '_')}",
+                    thumbnail=row["thumbnail"]
+                )
+                for row in local
+            ]
+    
+    client = http.client("wikipedia")
+    params = {
+        "action": "query",
+        "list": "search",
+        "srsearch": query,
+        "srlimit": limit,
+        "format": "json",
+        "origin": "*"
+    }
+    
+    try:
+        response = await client.get(WIKIPEDIA_API_URL, params=params)
+        response.raise_for_status()
+        data = response.json()
         
-        try:
-            response = await client.get(WIKIPEDIA_API_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            results = []
-            for item in data.get("query", {}).get("search", []):
-                thumbnail = None
-                if "thumbnail" in item:
-                    thumbnail = item["thumbnail"].get("source")
-                
-                results.append(WikipediaSearchResult(
-                    title=item["title"],
-                    snippet=item["snippet"].replace("...", "..."),
-                    pageid=item["pageid"],
-                    url=f"{WIKIPEDIA_PAGE_URL}{item['title'].replace(' ', '_')}",
-                    thumbnail=thumbnail
-                ))
+        results = []
+        for item in data.get("query", {}).get("search", []):
+            thumbnail = None
+            if "thumbnail" in item:
+                thumbnail = item["thumbnail"].get("source")
             
-            return results
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail=f"Wikipedia API error: {str(e)}")
+            results.append(WikipediaSearchResult(
+                title=item["title"],
+                snippet=item["snippet"].replace("...", "..."),
+                pageid=item["pageid"],
+                url=f"{WIKIPEDIA_PAGE_URL}{item['title'].replace(' ', '_')}",
+                thumbnail=thumbnail
+            ))
+        
+        return results
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Wikipedia API error: {str(e)}")
 
 
 @router.get("/article/{pageid}")
-async def get_article(pageid: int) -> WikipediaArticle:
+async def get_article(pageid: int, http: HTTPClients = Depends(get_http_clients)) -> WikipediaArticle:
     """
     Get a Wikipedia article by page ID
     """
-    async with httpx.AsyncClient() as client:
+    entry = _article_cache.get_entry(pageid)
+    if entry is not None and entry[1]:
+        return entry[0][0]
+    stale = entry[0] if entry is not None else _stored_article(pageid)
+    
+    # Concurrent requests for the same page share one upstream fetch
+    return await _article_flight.do(pageid, lambda: _load_article(http.client("wikipedia"), pageid, stale))
+
+
+async def _load_article(
+    client: httpx.AsyncClient,
+    pageid: int,
+    stale: Optional[Tuple[WikipediaArticle, int]],
+) -> WikipediaArticle:
+    """Revalidate a stale cached article by revision ID, or fetch it in one request"""
+    if stale is not None:
+        article, revid = stale
+        try:
+            current_revid = await _fetch_lastrevid(client, pageid)
+        except httpx.HTTPError:
+            # Upstream unreachable (e.g. offline with an ingested dump) - serve what we have
+            return article
+        if current_revid == revid:
+            _article_cache.set(pageid, stale)
+            return article
+    
+    try:
         params = {
             "action": "query",
-            "prop": "extracts|pageimages|categories",
+            "prop": "extracts|pageimages|categories|linkshere|info",
             "pageids": pageid,
-            "exintro": False,
             "explaintext": True,
             "pithumbsize": 500,
             "cllimit": 10,
+            "lhlimit": 5,
+            "format": "json",
+            "origin": "*"
+        }
+        
+        response = await client.get(WIKIPEDIA_API_URL, params=params)
+        response.raise_for_status()
+        data = response.json()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Wikipedia API error: {str(e)}")
+    
+    page = data.get("query", {}).get("pages", {}).get(str(pageid))
+    if not page or "missing" in page:
+        raise HTTPException(status_code=404, detail="Article not found")
+    
+    thumbnail = None
+    if "thumbnail" in page:
+        thumbnail = page["thumbnail"].get("source")
+    
+    categories = []
+    for cat in page.get("categories", []):
+        cat_title = cat["title"]
+        if cat_title.startswith("Category:"):
+            categories.append(cat_title.replace("Category:", ""))
+    
+    related_pages = [link["title"] for link in page.get("linkshere", [])]
+    
+    article = WikipediaArticle(
+        title=page["title"],
+        pageid=page["pageid"],
+        url=f"{WIKIPEDIA_PAGE_URL}{page['title'].replace(' ', '_')}",
+        extract=page.get("extract", ""),
+        thumbnail=thumbnail,
+        categories=categories,
+        related_pages=related_pages
+    )
+    _article_cache.set(pageid, (article, page.get("lastrevid", 0)))
+    ArticleStore.upsert({
+        "pageid": article.pageid,
+        "title": article.title,
+        "extract": article.extract,
+        "thumbnail": article.thumbnail,
+        "categories": article.categories,
+        "related_pages": article.related_pages,
+        "revid": page.get("lastrevid", 0),
+    })
+    return article
+
+
+def _stored_article(pageid: int) -> Optional[Tuple[WikipediaArticle, int]]:
+    """Full article from the local store, to be revalidated by revision ID"""
+    stored = ArticleStore.get(pageid)
+    if not stored or not stored["full_text"]:
+        return None
+    article = WikipediaArticle(
+        title=stored["title"],
+        pageid=stored["pageid"],
+        url=f"{WIKIPEDIA_PAGE_URL}{stored['title'].replace(' ', '_')}",
+        extract=stored["extract"],
+        thumbnail=stored["thumbnail"],
+        categories=stored["categories"],
+        related_pages=stored["related_pages"]
+    )
+    return article, stored["revid"]
+
+
+async def _fetch_lastrevid(client: httpx.AsyncClient, pageid: int) -> int:
+    """Cheap revision check for cache revalidation"""
+    params = {
+        "action": "query",
+        "prop": "info",
+        "pageids": pageid,
+        "format": "json",
+        "origin": "*"
+    }
+    response = await client.get(WIKIPEDIA_API_URL, params=params)
+    response.raise_for_status()
+    page = response.json().get("query", {}).get("pages", {}).get(str(pageid), {})
+    return page.get("lastrevid", -1)
+
+
+@router.get("/article/{pageid}/outline")
+async def get_article_outline(
+    pageid: int,
+    request: Request,
+    http: HTTPClients = Depends(get_http_clients),
+) -> ArticleOutline:
+    """
+    Get an article's intro and section headings
+    """
+    body = _outline_cache.get(pageid)
+    if body is None:
+        client = http.client("wikipedia")
+        intro_params = {
+            "action": "query",
+            "prop": "extracts|pageimages",
+            "pageids": pageid,
+            "exintro": True,
+            "explaintext": True,
+            "pithumbsize": 500,
+            "format": "json",
+            "origin": "*"
+        }
+        sections_params = {
+            "action": "parse",
+            "pageid": pageid,
+            "prop": "sections|revid",
             "format": "json",
             "origin": "*"
         }
         
         try:
-            response = await client.get(WIKIPEDIA_API_URL, params=params)
+            intro_response, sections_response = await asyncio.gather(
+                client.get(WIKIPEDIA_API_URL, params=intro_params),
+                client.get(WIKIPEDIA_API_URL, params=sections_params),
+            )
+            intro_response.raise_for_status()
+            sections_response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"Wikipedia API error: {str(e)}")
+        
+        page = intro_response.json().get("query", {}).get("pages", {}).get(str(pageid))
+        parsed = sections_response.json().get("parse")
+        if not page or "missing" in page or not parsed:
+            raise HTTPException(status_code=404, detail="Article not found")
+        
+        sections = [
+            ArticleSection(index=int(section["index"]), title=_strip_tags(section["line"]), level=int(section["level"]))
+            for section in parsed.get("sections", [])
+            if section.get("index", "").isdigit()
+        ]
+        
+        outline = ArticleOutline(
+            title=page["title"],
+            pageid=page["pageid"],
+            url=f"{WIKIPEDIA_PAGE_URL}{page['title'].replace(' ', '_')}",
+            revid=parsed.get("revid", 0),
+            intro=page.get("extract", ""),
+            thumbnail=page.get("thumbnail", {}).get("source"),
+            sections=sections
+        )
+        body = json.dumps(jsonable_encoder(outline)).encode()
+        _outline_cache.set(pageid, body)
+    
+    return conditional_json_response(request, body)
+
+
+@router.get("/article/{pageid}/section/{index}")
+async def get_article_section(
+    pageid: int,
+    index: int,
+    request: Request,
+    http: HTTPClients = Depends(get_http_clients),
+) -> SectionContent:
+    """
+    Get the plaintext of one article section (index from the outline)
+    """
+    body = _section_cache.get((pageid, index))
+    if body is None:
+        params = {
+            "action": "parse",
+            "pageid": pageid,
+            "section": index,
+            "prop": "wikitext",
+            "format": "json",
+            "origin": "*"
+        }
+        
+        try:
+            response = await http.client("wikipedia").get(WIKIPEDIA_API_URL, params=params)
             response.raise_for_status()
             data = response.json()
-            
-            page = data.get("query", {}).get("pages", {}).get(str(pageid))
-            if not page or page.get("missing"):
-                raise HTTPException(status_code=404, detail="Article not found")
-            
-            thumbnail = None
-            if "thumbnail" in page:
-                thumbnail = page["thumbnail"].get("source")
-            
-            categories = []
-            for cat in page.get("categories", []):
-                cat_title = cat["title"]
-                if cat_title.startswith("Category:"):
-                    categories.append(cat_title.replace("Category:", ""))
-            
-            # Get related pages (links to this page)
-            related_params = {
-                "action": "query",
-                "prop": "linkshere",
-                "lhlimit": 5,
-                "pageids": pageid,
-                "format": "json",
-                "origin": "*"
-            }
-            
-            related_response = await client.get(WIKIPEDIA_API_URL, params=related_params)
-            related_data = related_response.json()
-            
-            related_pages = []
-            for link in related_data.get("query", {}).get("pages", {}).get(str(pageid), {}).get("linkshere", []):
-                related_pages.append(link["title"])
-            
-            return WikipediaArticle(
-                title=page["title"],
-                pageid=page["pageid"],
-                url=f"{WIKIPEDIA_PAGE_URL}{page['title'].replace(' ', '_')}",
-                extract=page.get("extract", ""),
-                thumbnail=thumbnail,
-                categories=categories,
-                related_pages=related_pages
-            )
         except httpx.HTTPError as e:
             raise HTTPException(status_code=500, detail=f"Wikipedia API error: {str(e)}")
+        
+        parsed = data.get("parse")
+        if not parsed:
+            raise HTTPException(status_code=404, detail="Section not found")
+        
+        text = wikitext_to_plaintext(parsed.get("wikitext", {}).get("*", ""))
+        
+        # The section starts with its own heading line
+        title = ""
+        heading = SECTION_HEADING.match(text)
+        if heading:
+            title = heading.group(1).strip()
+            text = text[heading.end():].strip()
+        
+        section = SectionContent(pageid=pageid, index=index, title=title, text=text)
+        body = json.dumps(jsonable_encoder(section)).encode()
+        _section_cache.set((pageid, index), body)
+    
+    return conditional_json_response(request, body)
+
+
+def _strip_tags(html: str) -> str:
+    return re.sub(r"<[^>]+>", "", html)
 
 
 @router.get("/random")
 async def get_random_articles(
-    count: int = Query(5, ge=1, le=20, description="Number of random articles")
+    count: int = Query(5, ge=1, le=20, description="Number of random articles"),
+    http: HTTPClients = Depends(get_http_clients),
 ) -> List[WikipediaArticle]:
     """
     Get random Wikipedia articles for exploration
     """
-    async with httpx.AsyncClient() as client:
-        articles = []
-        
-        for _ in range(count):
-            try:
-                params = {
-                    "action": "query",
-                    "prop": "extracts|pageimages",
-                    "generator": "random",
-                    "grnnamespace": 0,
-                    "grnlimit": 1,
-                    "exintro": True,
-                    "explaintext": True,
-                    "pithumbsize": 300,
-                    "format": "json",
-                    "origin": "*"
-                }
-                
-                response = await client.get(WIKIPEDIA_API_URL, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                pages = data.get("query", {}).get("pages", {})
-                if pages:
-                    page_id = list(pages.keys())[0]
-                    page = pages[page_id]
-                    
-                    thumbnail = None
-                    if "thumbnail" in page:
-                        thumbnail = page["thumbnail"].get("source")
-                    
-                    articles.append(WikipediaArticle(
-                        title=page["title"],
-                        pageid=page["pageid"],
-                        url=f"{WIKIPEDIA_PAGE_URL}{page['title'].replace(' ', '_')}",
-                        extract=page.get("extract", "")[:500] + "...",
-                        thumbnail=thumbnail,
-                        categories=[],
-                        related_pages=[]
-                    ))
-            except Exception:
-                continue
+    if len(_random_pool) >= count:
+        articles = [_random_pool.popleft() for _ in range(count)]
+    else:
+        try:
+            articles = await _fetch_random_articles(http.client("wikipedia"), count)
+        except Exception:
+            articles = []
+    
+    _schedule_random_refill(http)
+    return articles
+
+
+async def _fetch_random_articles(client: httpx.AsyncClient, count: int) -> List[WikipediaArticle]:
+    """Fetch count random articles with one generator call"""
+    params = {
+        "action": "query",
+        "prop": "extracts|pageimages",
+        "generator": "random",
+        "grnnamespace": 0,
+        "grnlimit": count,
+        "exintro": True,
+        "explaintext": True,
+        "exlimit": "max",
+        "pithumbsize": 300,
+        "pilimit": count,
+        "format": "json",
+        "origin": "*"
+    }
+    
+    response = await client.get(WIKIPEDIA_API_URL, params=params)
+    response.raise_for_status()
+    data = response.json()
+    pages = list(data.get("query", {}).get("pages", {}).values())
+    
+    # Extracts are capped per response - fetch the truncated ones individually
+    missing = [page for page in pages if "extract" not in page]
+    if missing:
+        semaphore = asyncio.Semaphore(RANDOM_FETCH_CONCURRENCY)
+        extracts = await asyncio.gather(
+            *[_fetch_intro_extract(client, page["pageid"], semaphore) for page in missing]
+        )
+        for page, extract in zip(missing, extracts):
+            page["extract"] = extract
+    
+    articles = []
+    for page in pages:
+        thumbnail = None
+        if "thumbnail" in page:
+            thumbnail = page["thumbnail"].get("source")
         
-        return articles
+        articles.append(WikipediaArticle(
+            title=page["title"],
+            pageid=page["pageid"],
+            url=f"{WIKIPEDIA_PAGE_URL}{page['title'].replace(' ', '_')}",
+            extract=page.get("extract", "")[:500] + "...",
+            thumbnail=thumbnail,
+            categories=[],
+            related_pages=[]
+        ))
+    return articles
+
+
+async def _fetch_intro_extract(client: httpx.AsyncClient, pageid: int, semaphore: asyncio.Semaphore) -> str:
+    """Fetch the intro extract of a single page"""
+    params = {
+        "action": "query",
+        "prop": "extracts",
+        "pageids": pageid,
+        "exintro": True,
+        "explaintext": True,
+        "format": "json",
+        "origin": "*"
+    }
+    async with semaphore:
+        try:
+            response = await client.get(WIKIPEDIA_API_URL, params=params)
+            response.raise_for_status()
+            page = response.json().get("query", {}).get("pages", {}).get(str(pageid), {})
+            return page.get("extract", "")
+        except Exception:
+            return ""
+
+
+def _schedule_random_refill(http: HTTPClients):
+    """Top the random-article pool back up in the background"""
+    global _random_refill_task
+    if len(_random_pool) >= RANDOM_POOL_SIZE:
+        return
+    if _random_refill_task is not None and not _random_refill_task.done():
+        return
+    _random_refill_task = asyncio.ensure_future(_refill_random_pool(http))
+
+
+async def _refill_random_pool(http: HTTPClients):
+    client = http.client("wikipedia")
+    while len(_random_pool) < RANDOM_POOL_SIZE:
+        try:
+            batch = await _fetch_random_articles(client, min(20, RANDOM_POOL_SIZE - len(_random_pool)))
+        except Exception:
+            return
+        if not batch:
+            return
+        _random_pool.extend(batch)
 
 
 @router.get("/featured")
-async def get_featured_topics() -> List[FeaturedTopic]:
+async def get_featured_topics(http: HTTPClients = Depends(get_http_clients)) -> List[FeaturedTopic]:
     """
     Get featured exploration topics
     """
-    async with httpx.AsyncClient() as client:
-        featured = []
-        
-        # Sample featured topics with their Wikipedia page IDs
-        topics = [
-            ("Solar System", "Science", "Explore our cosmic neighborhood", 0),
-            ("Ancient Egypt", "History", "Discover the mysteries of the pharaohs", 0),
-            ("Human Brain", "Science", "Unlock the secrets of consciousness", 0),
-            ("World War II", "History", "Learn about the pivotal global conflict", 0),
-            ("Machine Learning", "Technology", "Dive into the world of AI", 0),
-            ("Ocean", "Nature", "Explore Earth's final frontier", 0),
-            ("Renaissance", "Culture", "Experience the rebirth of art and science", 0),
-            ("Quantum Physics", "Science", "Journey into the subatomic realm", 0),
-            ("Amazon Rainforest", "Nature", "Discover the lungs of our planet", 0),
-            ("Space Exploration", "Science", "Trace humanity's journey to the stars", 0),
-        ]
-        
-        for title, category, description, _ in topics:
-            # Search for the page ID
-            params = {
-                "action": "query",
-                "titles": title,
-                "format": "json",
-                "origin": "*"
-            }
-            
-            try:
-                response = await client.get(WIKIPEDIA_API_URL, params=params)
-                data = response.json()
-                
-                pages = data.get("query", {}).get("pages", {})
-                pageid = 0
-                thumbnail = None
-                
-                for page_id, page_data in pages.items():
-                    if "missing" not in page_data:
-                        pageid = int(page_id)
-                        if "thumbnail" in page_data:
-                            thumbnail = page_data["thumbnail"].get("source")
-                        break
-                
-                if pageid > 0:
-                    featured.append(FeaturedTopic(
-                        title=title,
-                        category=category,
-                        description=description,
-                        image_url=thumbnail,
-                        pageid=pageid
-                    ))
-            except Exception:
-                continue
+    if _featured["body"] is None:
+        await refresh_featured_topics(http)
+    elif time.monotonic() >= _featured["expires"]:
+        # Serve the stale list while a fresh one is fetched
+        _schedule_featured_refresh(http)
+    
+    return Response(content=_featured["body"] or b"[]", media_type="application/json")
+
+
+async def refresh_featured_topics(http: HTTPClients):
+    """Resolve all featured titles (with thumbnails) in one query and cache the encoded list"""
+    client = http.client("wikipedia")
+    params = {
+        "action": "query",
+        "titles": "|".join(title for title, _, _ in FEATURED_TOPICS),
+        "prop": "pageimages",
+        "pithumbsize": 300,
+        "redirects": 1,
+        "format": "json",
+        "origin": "*"
+    }
+    
+    try:
+        response = await client.get(WIKIPEDIA_API_URL, params=params)
+        response.raise_for_status()
+        data = response.json()
+    except Exception:
+        return
+    
+    query = data.get("query", {})
+    
+    # Follow title normalization and redirects back to the requested titles
+    resolved = {}
+    for mapping in query.get("normalized", []) + query.get("redirects", []):
+        resolved[mapping["from"]] = mapping["to"]
+    pages_by_title = {page["title"]: page for page in query.get("pages", {}).values() if "missing" not in page}
+    
+    featured = []
+    for title, category, description in FEATURED_TOPICS:
+        final_title = title
+        while final_title in resolved:
+            final_title = resolved[final_title]
+        page = pages_by_title.get(final_title)
+        if not page:
+            continue
         
-        return featured
+        featured.append(FeaturedTopic(
+            title=title,
+            category=category,
+            description=description,
+            image_url=page.get("thumbnail", {}).get("source"),
+            pageid=page["pageid"]
+        ))
+    
+    _featured["body"] = json.dumps(jsonable_encoder(featured)).encode()
+    _featured["expires"] = time.monotonic() + FEATURED_TTL
+
+
+def _schedule_featured_refresh(http: HTTPClients):
+    global _featured_refresh_task
+    if _featured_refresh_task is None or _featured_refresh_task.done():
+        _featured_refresh_task = asyncio.ensure_future(refresh_featured_topics(http))
+
+
+async def featured_refresh_loop(http: HTTPClients):
+    """Background job started in the app lifespan - keeps the featured list warm"""
+    while True:
+        await refresh_featured_topics(http)
+        await asyncio.sleep(FEATURED_TTL if _featured["body"] is not None else 60)
 
 
 @router.get("/category/{category}")
 async def get_category_articles(
     category: str,
-    limit: int = Query(10, ge=1, le=50)
+    limit: int = Query(10, ge=1, le=50),
+    http: HTTPClients = Depends(get_http_clients),
 ) -> List[WikipediaSearchResult]:
     """
     Get articles from a specific category
     """
-    async with httpx.AsyncClient() as client:
-        params = {
-            "action": "query",
-            "list": "categorymembers",
-            "cmtitle": f"Category:{category}",
-            "cmlimit": limit,
-            "format": "json",
-            "origin": "*"
-        }
+    client = http.client("wikipedia")
+    params = {
+        "action": "query",
+        "list": "categorymembers",
+        "cmtitle": f"Category:{category}",
+        "cmlimit": limit,
+        "format": "json",
+        "origin": "*"
+    }
+    
+    try:
+        response = await client.get(WIKIPEDIA_API_URL, params=params)
+        response.raise_for_status()
+        data = response.json()
         
-        try:
-            response = await client.get(WIKIPEDIA_API_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            results = []
-            for item in data.get("query", {}).get("categorymembers", []):
-                results.append(WikipediaSearchResult(
-                    title=item["title"],
-                    snippet="",
-                    pageid=item["pageid"],
-                    url=f"{WIKIPEDIA_PAGE_URL}{item['title'].replace(' ', '_')}",
-                    thumbnail=None
-                ))
-            
-            return results
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail=f"Wikipedia API error: {str(e)}")
+        results = []
+        for item in data.get("query", {}).get("categorymembers", []):
+            results.append(WikipediaSearchResult(
+                title=item["title"],
+                snippet="",
+                pageid=item["pageid"],
+                url=f"{WIKIPEDIA_PAGE_URL}{item['title'].replace(' ', '_')}",
+                thumbnail=None
+            ))
+        
+        return results
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Wikipedia API error: {str(e)}")
 
 
 @router.get("/trending")
-async def get_trending_articles() -> List[WikipediaSearchResult]:
+async def get_trending_articles(http: HTTPClients = Depends(get_http_clients)) -> List[FeaturedTopic]:
     """
     Get trending Wikipedia articles (most viewed)
     """
     # Wikipedia doesn't have a public trending API, so we return featured topics
-    return await get_featured_topics()
+    return await get_featured_topics(http)
 
 
 @router.get("/explore/random")
 async def explore_random(
-    category: Optional[str] = Query(None, description="Optional category to explore")
+    category: Optional[str] = Query(None, description="Optional category to explore"),
+    http: HTTPClients = Depends(get_http_clients),
 ) -> WikipediaArticle:
     """
     Get a random article to explore, optionally from a specific category
     """
-    async with httpx.AsyncClient() as client:
+    client = http.client("wikipedia")
+    params = {
+        "action": "query",
+        "prop": "extracts|pageimages|categories",
+        "generator": "random",
+        "grnnamespace": 0,
+        "grnlimit": 1,
+        "exintro": True,
+        "explaintext": True,
+        "pithumbsize": 500,
+        "cllimit": 5,
+        "format": "json",
+        "origin": "*"
+    }
+    
+    if category:
+        params["grncategory"] = category
+    
+    try:
+        response = await client.get(WIKIPEDIA_API_URL, params=params)
+        response.raise_for_status()
+        data = response.json()
+        
+        pages = data.get("query", {}).get("pages", {})
+        if not pages:
+            raise HTTPException(status_code=404, detail="No articles found")
+        
+        page_id = list(pages.keys())[0]
+        page = pages[page_id]
+        
+        thumbnail = None
+        if "thumbnail" in page:
+            thumbnail = page["thumbnail"].get("source")
+        
+        categories = []
+        for cat in page.get("categories", []):
+            cat_title = cat["title"]
+            if cat_title.startswith("Category:"):
+                categories.append(cat_title.replace("Category:", ""))
+        
+        return WikipediaArticle(
+            title=page["title"],
+            pageid=int(page_id),
+            url=f"{WIKIPEDIA_PAGE_URL}{page['title'].replace(' ', '_')}",
+            extract=page.get("extract", ""),
+            thumbnail=thumbnail,
+            categories=categories,
+            related_pages=[]
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Wikipedia API error: {str(e)}")
+
+
+async def warm_article_store(http: HTTPClients):
+    """Background job started in the app lifespan - index featured and category articles locally"""
+    client = http.client("wikipedia")
+    pageids = []
+    
+    if _featured["body"] is None:
+        await refresh_featured_topics(http)
+    if _featured["body"] is not None:
+        pageids.extend(topic["pageid"] for topic in json.loads(_featured["body"]))
+    
+    for category in EXPLORATION_CATEGORIES:
+        params = {
+            "action": "query",
+            "list": "categorymembers",
+            "cmtitle": f"Category:{category}",
+            "cmtype": "page",
+            "cmlimit": 20,
+            "format": "json",
+            "origin": "*"
+        }
+        try:
+            response = await client.get(WIKIPEDIA_API_URL, params=params)
+            response.raise_for_status()
+            members = response.json().get("query", {}).get("categorymembers", [])
+            pageids.extend(item["pageid"] for item in members)
+        except Exception:
+            continue
+    
+    pageids = ArticleStore.missing(list(dict.fromkeys(pageids)))
+    for i in range(0, len(pageids), 20):
         params = {
             "action": "query",
-            "prop": "extracts|pageimages|categories",
-            "generator": "random",
-            "grnnamespace": 0,
-            "grnlimit": 1,
+            "prop": "extracts|pageimages|info",
+            "pageids": "|".join(str(pageid) for pageid in pageids[i:i + 20]),
             "exintro": True,
             "explaintext": True,
-            "pithumbsize": 500,
-            "cllimit": 5,
+            "exlimit": "max",
+            "pithumbsize": 300,
             "format": "json",
             "origin": "*"
         }
-        
-        if category:
-            params["grncategory"] = category
-        
         try:
             response = await client.get(WIKIPEDIA_API_URL, params=params)
             response.raise_for_status()
-            data = response.json()
-            
-            pages = data.get("query", {}).get("pages", {})
-            if not pages:
-                raise HTTPException(status_code=404, detail="No articles found")
-            
-            page_id = list(pages.keys())[0]
-            page = pages[page_id]
-            
-            thumbnail = None
-            if "thumbnail" in page:
-                thumbnail = page["thumbnail"].get("source")
-            
-            categories = []
-            for cat in page.get("categories", []):
-                cat_title = cat["title"]
-                if cat_title.startswith("Category:"):
-                    categories.append(cat_title.replace("Category:", ""))
-            
-            return WikipediaArticle(
-                title=page["title"],
-                pageid=int(page_id),
-                url=f"{WIKIPEDIA_PAGE_URL}{page['title'].replace(' ', '_')}",
-                extract=page.get("extract", ""),
-                thumbnail=thumbnail,
-                categories=categories,
-                related_pages=[]
-            )
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail=f"Wikipedia API error: {str(e)}")
+            pages = response.json().get("query", {}).get("pages", {}).values()
+        except Exception:
+            continue
+        
+        ArticleStore.upsert_many([
+            {
+                "pageid": page["pageid"],
+                "title": page["title"],
+                "extract": page.get("extract", ""),
+                "thumbnail": page.get("thumbnail", {}).get("source"),
+                "revid": page.get("lastrevid", 0),
+                "full_text": False,
+            }
+            for page in pages
+            if "missing" not in page and page.get("extract")
+        ])
+
+
+def stats() -> dict:
+    """Article cache and random pool counters for diagnostics."""
+    return {
+        "article_cache": _article_cache.stats(),
+        "article_singleflight": _article_flight.stats(),
+        "random_pool": len(_random_pool),
+    }
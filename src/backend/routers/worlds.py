@@ -1,4 +1,5 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from responses import register_static
 
 router = APIRouter()
 
@@ -43,10 +44,13 @@ WORLDS = [
 ]
 
 
+ALL_WORLDS_RESPONSE = register_static("worlds", {"worlds": WORLDS})
+
+
 @router.get("/")
-async def get_all_worlds():
+async def get_all_worlds(request: Request):
     """Get all available worlds."""
-    return {"worlds": WORLDS}
+    return ALL_WORLDS_RESPONSE(request)
 
 
 @router.get("/{world_id}")
@@ -0,0 +1,119 @@
+"""
+Rate-limited request scheduling
+Runs upstream calls for one host at most once per interval, from a bounded
+priority queue, merging duplicate requests that are already queued
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Lower runs first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class SchedulerBusy(Exception):
+    """Raised when a request would wait in the queue longer than allowed."""
+
+    def __init__(self, name: str, estimated_wait: float):
+        super().__init__(f"{name} queue is full (estimated wait {estimated_wait:.1f}s)")
+        self.estimated_wait = estimated_wait
+
+
+class _Job:
+    def __init__(self, fn: Callable[[], Awaitable[Any]], priority: int, future: asyncio.Future):
+        self.fn = fn
+        self.priority = priority
+        self.future = future
+        self.started = False
+
+
+class RateLimitedScheduler:
+    """Serializes calls to one host with a minimum spacing between request starts."""
+
+    def __init__(self, name: str, min_interval: float = 1.0, max_queue: int = 20, max_wait: float = 3.0):
+        self.name = name
+        self.min_interval = min_interval
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._jobs: Dict[Hashable, _Job] = {}
+        self._seq = itertools.count()
+        self._next_slot = 0.0
+        self._worker: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.merged = 0
+        self.rejected = 0
+        self.completed = 0
+
+    def estimated_wait(self, priority: int = INTERACTIVE) -> float:
+        """Seconds a new request at this priority would wait before it starts."""
+        ahead = sum(1 for job in self._jobs.values() if not job.started and job.priority <= priority)
+        return max(0.0, self._next_slot - time.monotonic()) + ahead * self.min_interval
+
+    async def submit(self, key: Hashable, fn: Callable[[], Awaitable[Any]], priority: int = INTERACTIVE,
+                     max_wait: Optional[float] = None) -> Any:
+        """Queue fn under key (or join the queued/running call with that key) and await its result.
+
+        Raises SchedulerBusy instead of queueing when the wait would exceed max_wait.
+        """
+        job = self._jobs.get(key)
+        if job is not None:
+            self.merged += 1
+            if priority < job.priority and not job.started:
+                # An interactive caller joined a background job - move it up the queue
+                job.priority = priority
+                heapq.heappush(self._heap, (priority, next(self._seq), key))
+            return await asyncio.shield(job.future)
+
+        wait = self.estimated_wait(priority)
+        if len(self._jobs) >= self.max_queue or wait > (self.max_wait if max_wait is None else max_wait):
+            self.rejected += 1
+            raise SchedulerBusy(self.name, wait)
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the outcome retrieved even if every caller has gone away
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._jobs[key] = _Job(fn, priority, future)
+        heapq.heappush(self._heap, (priority, next(self._seq), key))
+        self.submitted += 1
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        while self._heap:
+            priority, _, key = heapq.heappop(self._heap)
+            job = self._jobs.get(key)
+            # Stale heap entry left behind by a priority bump
+            if job is None or job.started or priority != job.priority:
+                continue
+
+            delay = self._next_slot - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            job.started = True
+            self._next_slot = time.monotonic() + self.min_interval
+            try:
+                job.future.set_result(await job.fn())
+            except Exception as e:
+                job.future.set_exception(e)
+            finally:
+                self._jobs.pop(key, None)
+                self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "queued": sum(1 for job in self._jobs.values() if not job.started),
+            "max_queue": self.max_queue,
+            "min_interval_s": self.min_interval,
+            "estimated_wait_s": round(self.estimated_wait(BACKGROUND), 2),
+            "submitted": self.submitted,
+            "merged": self.merged,
+            "rejected": self.rejected,
+            "completed": self.completed,
+        }
@@ -0,0 +1,119 @@
+"""
+Singleflight request coalescing
+Concurrent calls with the same key share one in-flight upstream call
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+import httpx
+
+# Methods whose identical concurrent requests are safe to share
+COALESCED_METHODS = {"GET", "HEAD"}
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; later callers await the first one's result."""
+
+    def __init__(self, name: str, cancel_abandoned: bool = True):
+        self.name = name
+        # Cancel the shared call once every waiter has been cancelled
+        self.cancel_abandoned = cancel_abandoned
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(fn())
+            call = _Call(task)
+            self._calls[key] = call
+            task.add_done_callback(lambda t, key=key, call=call: self._finish(key, call, t))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # Shielded so one caller's cancellation doesn't cancel the call for the others
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and self.cancel_abandoned and not call.task.done():
+                call.task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _finish(self, key: Hashable, call: _Call, task: asyncio.Task):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the outcome retrieved even if every waiter has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._calls),
+        }
+
+
+def request_key(request: httpx.Request) -> Tuple[str, ...]:
+    """Normalized method, URL, sorted params, body and credentials of a request."""
+    params = tuple(sorted(request.url.params.multi_items()))
+    auth = request.headers.get("authorization", "")
+    return (
+        request.method,
+        f"{request.url.scheme}://{request.url.host}{request.url.path}",
+        repr(params),
+        hashlib.sha256(request.content).hexdigest() if request.content else "",
+        hashlib.sha256(auth.encode()).hexdigest() if auth else "",
+    )
+
+
+class SingleflightTransport(httpx.AsyncBaseTransport):
+    """Coalesces identical concurrent GET/HEAD requests into one upstream request."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, flight: SingleFlight):
+        self._transport = transport
+        self._flight = flight
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in COALESCED_METHODS:
+            return await self._transport.handle_async_request(request)
+
+        await request.aread()
+        status, headers, body = await self._flight.do(request_key(request), lambda: self._fetch(request))
+        return httpx.Response(status, headers=headers, content=body, request=request)
+
+    async def _fetch(self, request: httpx.Request) -> Tuple[int, list, bytes]:
+        response = await self._transport.handle_async_request(request)
+        try:
+            body = await response.aread()
+        finally:
+            await response.aclose()
+        # The body is shared already decoded, so drop the encoding/length headers
+        headers = [
+            (k, v) for k, v in response.headers.multi_items()
+            if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        return response.status_code, headers, body
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,147 @@
+"""
+Offline Wikipedia dump ingestion
+Stream-parses a MediaWiki XML dump (plain or .bz2) and loads article
+plaintext into the local article store used by the Wikipedia router
+
+Usage:
+    python src/backend/wikipedia_dump.py enwiki-latest-pages-articles.xml.bz2 \\
+        --category Astronomy --category Physics --batch-size 500
+"""
+
+import argparse
+import bz2
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional, Set
+
+from article_store import SOURCE_DUMP, ArticleStore, get_connection, init_article_store
+from wikitext import wikitext_to_plaintext
+
+CATEGORY_PATTERN = re.compile(r"\[\[\s*Category\s*:\s*([^\]|]+)", re.IGNORECASE)
+
+
+def _local(tag: str) -> str:
+    """Tag name without the export-schema namespace."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_pages(path: str) -> Iterator[Dict]:
+    """Yield main-namespace, non-redirect pages from a dump in constant memory."""
+    opener = bz2.open if path.endswith(".bz2") else open
+    with opener(path, "rb") as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end" or _local(elem.tag) != "page":
+                continue
+
+            page = {"redirect": False}
+            for child in elem:
+                name = _local(child.tag)
+                if name in ("title", "ns", "id"):
+                    page[name] = child.text or ""
+                elif name == "redirect":
+                    page["redirect"] = True
+                elif name == "revision":
+                    for rev_child in child:
+                        rev_name = _local(rev_child.tag)
+                        if rev_name == "id":
+                            page["revid"] = int(rev_child.text or 0)
+                        elif rev_name == "text":
+                            page["text"] = rev_child.text or ""
+
+            # Drop the parsed page so memory stays flat across the dump
+            root.clear()
+
+            if page.get("ns") == "0" and not page["redirect"] and page.get("text"):
+                yield page
+
+
+def ingest(
+    path: str,
+    categories: Optional[Set[str]] = None,
+    titles: Optional[Set[str]] = None,
+    batch_size: int = 500,
+    limit: Optional[int] = None,
+    report_every: int = 1000,
+) -> int:
+    """Load matching pages into the article store in batched transactions; returns pages loaded."""
+    init_article_store()
+    conn = get_connection()
+    batch: List[Dict] = []
+    scanned = 0
+    loaded = 0
+    start = time.monotonic()
+
+    def flush():
+        ArticleStore.upsert_many(batch, conn=conn)
+        batch.clear()
+
+    for page in iter_pages(path):
+        scanned += 1
+        page_categories = [c.strip().replace("_", " ") for c in CATEGORY_PATTERN.findall(page["text"])]
+
+        if titles is not None and page["title"] not in titles:
+            continue
+        if categories is not None and not categories.intersection(page_categories):
+            continue
+
+        extract = wikitext_to_plaintext(page["text"])
+        if not extract:
+            continue
+        batch.append({
+            "pageid": int(page["id"]),
+            "title": page["title"],
+            "extract": extract,
+            "categories": page_categories[:10],
+            "revid": page.get("revid", 0),
+            "source": SOURCE_DUMP,
+        })
+        loaded += 1
+
+        if len(batch) >= batch_size:
+            flush()
+        if loaded % report_every == 0:
+            elapsed = time.monotonic() - start
+            print(f"{loaded} pages loaded ({scanned} scanned), {scanned / elapsed:.0f} pages/s")
+        if limit is not None and loaded >= limit:
+            break
+
+    if batch:
+        flush()
+    ArticleStore.evict(conn)
+    conn.close()
+
+    elapsed = time.monotonic() - start
+    print(f"Done: {loaded} pages loaded from {scanned} scanned in {elapsed:.1f}s "
+          f"({scanned / elapsed if elapsed else 0:.0f} pages/s)")
+    return loaded
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load a MediaWiki XML dump into the local article store")
+    parser.add_argument("dump", help="Path to pages-articles XML dump (.xml or .xml.bz2)")
+    parser.add_argument("--category", action="append", help="Only load pages in this category (repeatable)")
+    parser.add_argument("--titles-file", help="Only load titles listed in this file, one per line")
+    parser.add_argument("--batch-size", type=int, default=500, help="Pages per transaction")
+    parser.add_argument("--limit", type=int, help="Stop after loading this many pages")
+    args = parser.parse_args(argv)
+
+    titles = None
+    if args.titles_file:
+        with open(args.titles_file, encoding="utf-8") as f:
+            titles = {line.strip() for line in f if line.strip()}
+
+    ingest(
+        args.dump,
+        categories=set(args.category) if args.category else None,
+        titles=titles,
+        batch_size=args.batch_size,
+        limit=args.limit,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""
+MediaWiki markup to plaintext
+Shared by the dump ingestion tool and the section endpoints of the Wikipedia router
+"""
+
+import re
+
+# Applied in order; nested constructs are removed innermost-first in _strip_nested
+MARKUP_PATTERNS = [
+    (re.compile(r"<!--.*?-->", re.DOTALL), ""),
+    (re.compile(r"<ref[^>/]*/>", re.IGNORECASE), ""),
+    (re.compile(r"<ref[^>]*>.*?</ref>", re.IGNORECASE | re.DOTALL), ""),
+    (re.compile(r"\[\[\s*(?:File|Image|Category)\s*:[^\[\]]*\]\]", re.IGNORECASE), ""),
+    (re.compile(r"\[\[[^\[\]|]*\|([^\[\]]*)\]\]"), r"\1"),
+    (re.compile(r"\[\[([^\[\]]*)\]\]"), r"\1"),
+    (re.compile(r"\[https?://[^\s\]]+\s+([^\]]*)\]"), r"\1"),
+    (re.compile(r"\[https?://[^\]]*\]"), ""),
+    (re.compile(r"'{2,}"), ""),
+    (re.compile(r"<[^>]+>"), ""),
+    (re.compile(r"^[*#:;]+\s*", re.MULTILINE), ""),
+    (re.compile(r"[ \t]+"), " "),
+    (re.compile(r"\n{3,}"), "\n\n"),
+]
+TEMPLATE_PATTERN = re.compile(r"\{\{[^{}]*\}\}")
+TABLE_PATTERN = re.compile(r"\{\|[^{}]*?\|\}", re.DOTALL)
+NESTED_FILE_PATTERN = re.compile(r"\[\[\s*(?:File|Image)\s*:(?:[^\[\]]|\[\[[^\[\]]*\]\])*\]\]", re.IGNORECASE)
+
+
+def _strip_nested(pattern: re.Pattern, text: str) -> str:
+    """Remove a nestable construct by repeatedly deleting its innermost matches."""
+    while True:
+        stripped = pattern.sub("", text)
+        if stripped == text:
+            return text
+        text = stripped
+
+
+def wikitext_to_plaintext(wikitext: str) -> str:
+    """Approximate MediaWiki markup -> plaintext (headings kept as '== Heading ==' like API extracts)."""
+    text = _strip_nested(TEMPLATE_PATTERN, wikitext)
+    text = _strip_nested(TABLE_PATTERN, text)
+    text = NESTED_FILE_PATTERN.sub("", text)
+    for pattern, replacement in MARKUP_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text.strip()
@@ -0,0 +1,117 @@
+"""
+Notification lookup microbenchmark
+Compares the original per-character list scans with the per-character Inbox
+(deque, id index, unread counter), the NotificationStore that serves reads
+from those inboxes, and the SQLite table behind it with and without its index.
+Run by hand - pytest does not collect it:
+
+    python tests/bench_notifications.py [characters] [per_character] [lookups]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import timeit
+import uuid
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "backend")
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, "routers"))
+
+import database  # noqa: E402
+from database import NotificationDB  # noqa: E402
+from notifications import MAX_NOTIFICATIONS_PER_CHARACTER, Inbox, NotificationStore  # noqa: E402
+
+
+def build(characters: int, per_character: int):
+    names = [f"character-{i}" for i in range(characters)]
+    lists = {}
+    rows = []
+    for name in names:
+        inbox = []
+        for j in range(per_character):
+            notification = {
+                "id": str(uuid.uuid4()),
+                "character_name": name,
+                "type": "system",
+                "title": "Benchmark",
+                "message": f"Notification {j}",
+                "is_read": j % 3 == 0,
+                "created_at": f"2026-01-01T00:{j // 60:02d}:{j % 60:02d}",
+                "data": None,
+            }
+            inbox.insert(0, notification)
+            rows.append(notification)
+        lists[name] = inbox
+    NotificationDB.add_many(rows)
+    return names, lists
+
+
+def list_scan(lists, name: str, notification_id: str):
+    # The original handlers: recount unread and scan for the id on every call
+    inbox = lists.get(name, [])
+    unread = sum(1 for n in inbox if not n["is_read"])
+    found = next((n for n in inbox if n["id"] == notification_id), None)
+    return unread, found, inbox[:20]
+
+
+def inbox_lookup(inboxes, name: str, notification_id: str):
+    inbox = inboxes[name]
+    return inbox.unread_total, inbox.by_id.get(notification_id), inbox.page(0, 20)
+
+
+def store_read(store: NotificationStore, name: str, notification_id: str):
+    return store.page(name, limit=20)
+
+
+def table_read(name: str, notification_id: str):
+    # What a GET cost before the inboxes: a connection for the page and one for the count
+    return NotificationDB.get_page(name, limit=20), NotificationDB.unread_count(name)
+
+
+def table_load(name: str, notification_id: str):
+    return NotificationDB.get_inbox(name, MAX_NOTIFICATIONS_PER_CHARACTER)
+
+
+def report(label: str, seconds: float, lookups: int):
+    print(f"{label:<32} {seconds / lookups * 1e6:10.1f} us/lookup")
+
+
+def main():
+    characters = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_character = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    lookups = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        database.DATABASE_PATH = os.path.join(tmp, "data", "bench.db")
+        database.init_db()
+        names, lists = build(characters, per_character)
+        rng = random.Random(0)
+        queries = []
+        for _ in range(lookups):
+            name = rng.choice(names)
+            queries.append((name, rng.choice(lists[name])["id"]))
+
+        inboxes = {name: Inbox(*NotificationDB.get_inbox(name, MAX_NOTIFICATIONS_PER_CHARACTER)) for name in names}
+        store = NotificationStore(ttl=3600, max_inboxes=characters)
+        for name in names:
+            store.page(name)
+
+        print(f"{characters} characters x {per_character} notifications, {lookups} lookups")
+        report("list scan (in memory)", timeit.timeit(lambda: [list_scan(lists, *q) for q in queries], number=1), lookups)
+        report("Inbox (in memory)", timeit.timeit(lambda: [inbox_lookup(inboxes, *q) for q in queries], number=1), lookups)
+        report("NotificationStore read (warm)", timeit.timeit(lambda: [store_read(store, *q) for q in queries], number=1), lookups)
+        report("inbox load (one query)", timeit.timeit(lambda: [table_load(*q) for q in queries], number=1), lookups)
+        report("table page + count (indexed)", timeit.timeit(lambda: [table_read(*q) for q in queries], number=1), lookups)
+
+        conn = database.get_connection()
+        conn.execute("DROP INDEX idx_notifications_character")
+        conn.commit()
+        conn.close()
+        report("table page + count (no index)", timeit.timeit(lambda: [table_read(*q) for q in queries], number=1), lookups)
+
+
+if __name__ == "__main__":
+    main()
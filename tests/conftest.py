@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(tmp_path, monkeypatch):
+    """Run each test against fresh SQLite files under a temporary directory."""
+    import database
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "data" / "infinity_explorer.db"))
+    database.init_db()
+    yield tmp_path
+
+
+@pytest.fixture
+def router_client():
+    """Factory for a TestClient serving one router, its upstreams answered by a MockTransport handler.
+
+    Without a handler the app has no HTTP clients, for routers that make no upstream calls.
+    """
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import httpx
+    from http_client import HTTPClients
+
+    def make(router, prefix: str = "", handler=None) -> TestClient:
+        app = FastAPI()
+        app.include_router(router, prefix=prefix)
+        if handler is not None:
+            app.state.http_clients = HTTPClients(transport=httpx.MockTransport(handler))
+        return TestClient(app)
+
+    return make
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+import article_store
+from article_store import SOURCE_DUMP, ArticleStore, get_connection, init_article_store
+
+pytestmark = pytest.mark.skipif(not article_store.FTS5_AVAILABLE, reason="SQLite built without FTS5")
+
+
+@pytest.fixture(autouse=True)
+def store():
+    init_article_store()
+
+
+def age_all(seconds: float):
+    conn = get_connection()
+    conn.execute('UPDATE articles SET fetched_at = ?', (time.time() - seconds,))
+    conn.commit()
+    conn.close()
+
+
+def test_dump_articles_outlive_the_search_age_limit():
+    ArticleStore.upsert_many([
+        {"pageid": 1, "title": "Nebula (api)", "extract": "A nebula is a cloud of gas."},
+        {"pageid": 2, "title": "Nebula (dump)", "extract": "A nebula is a cloud of dust.", "source": SOURCE_DUMP},
+    ])
+    age_all(article_store.ARTICLE_STORE_MAX_AGE + 60)
+
+    assert [row["pageid"] for row in ArticleStore.search("nebula")] == [2]
+
+
+def test_snippets_escape_article_text():
+    ArticleStore.upsert({"pageid": 1, "title": "Markup", "extract": "The <b>comet</b> & its tail"})
+
+    snippet = ArticleStore.search("comet")[0]["snippet"]
+    assert snippet == 'The &lt;b&gt;<span class="searchmatch">comet</span>&lt;/b&gt; &amp; its tail'
+
+
+def test_size_total_tracks_writes():
+    ArticleStore.upsert_many([
+        {"pageid": 1, "title": "A", "extract": "x" * 100},
+        {"pageid": 2, "title": "B", "extract": "y" * 50},
+    ])
+    ArticleStore.upsert({"pageid": 1, "title": "A", "extract": "x" * 10})
+    conn = get_connection()
+    conn.execute('DELETE FROM articles WHERE pageid = 2')
+    conn.commit()
+    tracked = conn.execute('SELECT bytes FROM article_store_size').fetchone()[0]
+    conn.close()
+
+    assert tracked == 10
+    assert ArticleStore.stats()["bytes"] == 10
@@ -0,0 +1,11 @@
+from article_store import init_article_store
+from routers import diagnostics
+
+
+def test_router_stats_endpoints(router_client):
+    init_article_store()
+    client = router_client(diagnostics.router, "/api/diagnostics")
+
+    assert "article_cache" in client.get("/api/diagnostics/wikipedia").json()
+    assert "neo_day_cache" in client.get("/api/diagnostics/nasa").json()
+    assert client.get("/api/diagnostics/media").json()["cache"] is None
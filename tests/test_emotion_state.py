@@ -0,0 +1,23 @@
+import threading
+
+from database import EmotionStateDB
+
+RECORDS_PER_THREAD = 25
+THREADS = 4
+
+
+def test_concurrent_records_match_sequential_ones():
+    for _ in range(RECORDS_PER_THREAD * THREADS):
+        EmotionStateDB.record("sequential", "joy", world_id="earth")
+
+    def record_many():
+        for _ in range(RECORDS_PER_THREAD):
+            EmotionStateDB.record("concurrent", "joy", world_id="earth")
+
+    threads = [threading.Thread(target=record_many) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert EmotionStateDB.get("concurrent") == EmotionStateDB.get("sequential")
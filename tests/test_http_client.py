@@ -0,0 +1,29 @@
+import asyncio
+
+import httpx
+
+from http_client import MAX_RETRIES, HTTPClients
+
+
+def attempts_for(upstream: str) -> int:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(503)
+
+    async def fetch():
+        http = HTTPClients(transport=httpx.MockTransport(handler))
+        await http.client(upstream).get("https://example.org/")
+        await http.aclose()
+
+    asyncio.run(fetch())
+    return len(calls)
+
+
+def test_nominatim_requests_are_not_retried_by_the_transport():
+    assert attempts_for("nominatim") == 1
+
+
+def test_other_upstreams_retry_unavailable_responses():
+    assert attempts_for("wikipedia") == 1 + MAX_RETRIES
@@ -0,0 +1,89 @@
+import io
+
+import httpx
+import pytest
+
+from media_cache import MediaCache
+from routers import media
+
+IMAGE_URL = "https://upload.wikimedia.org/a.png"
+
+
+@pytest.fixture
+def media_client(monkeypatch, tmp_path, router_client):
+    monkeypatch.setattr(media, "media_cache", MediaCache(root=str(tmp_path / "media")))
+    monkeypatch.setattr(media, "MEDIA_MAX_FETCH_BYTES", 1000)
+    return lambda handler: router_client(media.router, "/api/media", handler)
+
+
+async def chunks(count: int):
+    for _ in range(count):
+        yield b"x" * 100
+
+
+def test_redirects_are_followed_and_cached(media_client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/a.png":
+            return httpx.Response(302, headers={"Location": "https://upload.wikimedia.org/b.png"})
+        return httpx.Response(200, headers={"Content-Type": "image/png"}, content=b"png-bytes")
+
+    client = media_client(handler)
+
+    response = client.get("/api/media", params={"url": IMAGE_URL})
+    assert response.status_code == 200
+    assert response.content == b"png-bytes"
+    assert client.get("/api/media", params={"url": IMAGE_URL}).status_code == 200
+    assert media.media_cache.stats()["hits"] == 1
+
+
+def test_oversized_streamed_body_is_rejected(media_client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        # No Content-Length, so the limit is enforced while reading
+        return httpx.Response(200, headers={"Content-Type": "image/png"}, content=chunks(50))
+
+    client = media_client(handler)
+
+    assert client.get("/api/media", params={"url": IMAGE_URL}).status_code == 413
+
+
+def test_svg_is_rejected_and_images_carry_security_headers(media_client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith(".svg"):
+            return httpx.Response(200, headers={"Content-Type": "image/svg+xml"}, content=b"<svg onload='x()'/>")
+        return httpx.Response(200, headers={"Content-Type": "image/png"}, content=b"png-bytes")
+
+    client = media_client(handler)
+
+    assert client.get("/api/media", params={"url": "https://upload.wikimedia.org/a.svg"}).status_code == 415
+    response = client.get("/api/media", params={"url": IMAGE_URL})
+    assert response.headers["content-security-policy"] == "default-src 'none'"
+    assert response.headers["x-content-type-options"] == "nosniff"
+
+
+def test_evicted_blobs_outlive_their_index_entry(tmp_path):
+    cache = MediaCache(root=str(tmp_path / "media"), max_bytes=150, unlink_delay=60)
+    first = cache.store("a", b"a" * 100, "image/png")
+    cache.store("b", b"b" * 100, "image/png")
+
+    assert cache.lookup("a") is None
+    assert open(first[0], "rb").read() == b"a" * 100
+
+    cache.unlink_delay = 0
+    cache._doomed = [(0.0, digest) for _, digest in cache._doomed]
+    cache.store("c", b"c" * 10, "image/png")
+    assert not (tmp_path / "media" / first[2][:2] / first[2]).exists()
+
+
+def test_decompression_bomb_is_served_unresized(monkeypatch, media_client):
+    Image = pytest.importorskip("PIL.Image")
+    out = io.BytesIO()
+    Image.new("RGB", (100, 100)).save(out, format="PNG")
+    body = out.getvalue()
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 10)
+
+    client = media_client(lambda request: httpx.Response(
+        200, headers={"Content-Type": "image/png"}, content=body))
+
+    response = client.get("/api/media", params={"url": IMAGE_URL, "w": 50})
+    assert response.status_code == 200
+    assert response.content == body
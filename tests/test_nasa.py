@@ -0,0 +1,89 @@
+import asyncio
+import time
+from datetime import date
+
+import httpx
+import pytest
+
+from cache import TTLCache
+from database import ApodDB
+from http_client import HTTPClients
+from routers import nasa
+
+TODAY = date(2026, 3, 2)
+YESTERDAY = "2026-03-01"
+
+
+@pytest.fixture
+def apod_client(monkeypatch, router_client):
+    # Today's entry is not published yet and the upstream check was just made
+    monkeypatch.setattr(nasa, "_eastern_today", lambda: TODAY)
+    monkeypatch.setitem(nasa._apod_state, "checked", time.monotonic())
+    ApodDB.upsert_many([{
+        "date": YESTERDAY,
+        "title": "Yesterday",
+        "explanation": "",
+        "url": "https://apod.nasa.gov/apod/image/small.jpg",
+        "hdurl": "https://apod.nasa.gov/apod/image/large.jpg",
+        "media_type": "image",
+    }])
+    return router_client(nasa.router, "/api/nasa", lambda request: httpx.Response(404))
+
+
+def test_latest_apod_stand_in_is_cached_briefly(apod_client):
+    response = apod_client.get("/api/nasa/apod")
+    assert response.json()["date"] == YESTERDAY
+    assert response.json()["hdurl"] == "https://apod.nasa.gov/apod/image/large.jpg"
+    assert response.headers["cache-control"].endswith(f"max-age={nasa.APOD_RETRY_INTERVAL}")
+
+
+def test_requested_past_apod_is_cached_long(apod_client):
+    response = apod_client.get("/api/nasa/apod", params={"date": YESTERDAY})
+    assert response.headers["cache-control"].endswith(f"max-age={nasa.APOD_ARCHIVE_MAX_AGE}")
+
+
+def neo(name: str, miss_km):
+    approach = {"relative_velocity": {"kilometers_per_second": "12.5"}}
+    if miss_km is not None:
+        approach["miss_distance"] = {"kilometers": miss_km}
+    return {
+        "id": name,
+        "name": name,
+        "estimated_diameter": {"kilometers": {"estimated_diameter_max": 0.5}},
+        "close_approach_data": [approach],
+    }
+
+
+def test_neo_without_miss_distance_is_served_and_left_out_of_closest(monkeypatch, router_client):
+    feed = {"near_earth_objects": {"2026-03-01": [neo("known", "384400"), neo("unknown", None)]}}
+    monkeypatch.setattr(nasa, "_neo_days", TTLCache(ttl=nasa.NEO_TTL, max_entries=nasa.NEO_CACHE_DAYS))
+    client = router_client(nasa.router, "/api/nasa", lambda request: httpx.Response(200, json=feed))
+    params = {"start_date": "2026-03-01", "end_date": "2026-03-01"}
+
+    largest = client.get("/api/nasa/neo", params={**params, "sort": "largest"})
+    assert largest.status_code == 200
+    assert {a["name"]: a["miss_distance_km"] for a in largest.json()["asteroids"]} == {"known": 384400.0, "unknown": None}
+
+    closest = client.get("/api/nasa/neo", params={**params, "sort": "closest"}).json()
+    assert [a["name"] for a in closest["asteroids"]] == ["known"]
+
+
+def test_apod_prefetch_survives_malformed_responses(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, text="<html>not json</html>")
+
+    monkeypatch.setattr(nasa, "APOD_RETRY_INTERVAL", 0.01)
+
+    async def scenario():
+        http = HTTPClients(transport=httpx.MockTransport(handler))
+        loop = asyncio.ensure_future(nasa.apod_prefetch_loop(http))
+        await asyncio.sleep(0.2)
+        assert not loop.done()
+        loop.cancel()
+        await http.aclose()
+
+    asyncio.run(scenario())
+    assert len(calls) > 1
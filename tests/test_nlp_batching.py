@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from circuit_breaker import CircuitBreaker
+from routers import nlp
+
+LABELS = [{"label": "joy", "score": 0.9}, {"label": "sadness", "score": 0.1}]
+
+
+@pytest.fixture
+def nlp_app(monkeypatch, router_client):
+    monkeypatch.setattr(nlp, "HUGGINGFACE_API_KEY", "test-key")
+    monkeypatch.setattr(nlp, "huggingface_breaker", CircuitBreaker("huggingface-test"))
+    return lambda handler: router_client(nlp.router, handler=handler).app
+
+
+async def analyze_concurrently(app: FastAPI, count: int) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post("/nlp/analyze", json={"text": f"message number {i}"})
+            for i in range(count)
+        ))
+    await app.state.http_clients.aclose()
+    return [response.json() for response in responses]
+
+
+def test_concurrent_analyses_share_upstream_batches(nlp_app):
+    batches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        inputs = json.loads(request.content)["inputs"]
+        batches.append(len(inputs))
+        return httpx.Response(200, json=[LABELS for _ in inputs])
+
+    count = 12
+    results = asyncio.run(analyze_concurrently(nlp_app(handler), count))
+
+    # Every analysis sends one emotion and one sentiment item
+    assert sum(batches) == 2 * count
+    assert len(batches) < 2 * count
+    assert all(result["fallback"] == [] for result in results)
+    assert all(result["dominant_emotion"]["label"] == "joy" for result in results)
+
+
+def test_rejected_batch_falls_back_per_item(nlp_app):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(400, text="bad input")
+
+    results = asyncio.run(analyze_concurrently(nlp_app(handler), 4))
+
+    for result in results:
+        assert result["fallback"] == ["emotions:upstream_error", "sentiment:upstream_error"]
+        assert result["emotion_trend"]
+
+
+def test_unreachable_upstream_falls_back(nlp_app):
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    results = asyncio.run(analyze_concurrently(nlp_app(handler), 2))
+
+    for result in results:
+        assert result["fallback"] == ["emotions:upstream_error", "sentiment:upstream_error"]
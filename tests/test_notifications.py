@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from database import NotificationDB
+from routers import notifications
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    # Inboxes cached by an earlier test would outlive its database
+    monkeypatch.setattr(notifications, "notification_store", notifications.NotificationStore())
+
+
+@pytest.fixture
+def client(router_client):
+    return router_client(notifications.router, "/api/notifications")
+
+
+def test_created_notification_is_listed_and_counted_unread(client):
+    response = client.post("/api/notifications/", json={
+        "character_name": "astra",
+        "type": "level_up",
+        "title": "Level Up!",
+        "message": "You reached level 2",
+        "data": {"level": 2},
+    })
+    assert response.status_code == 200
+    created = response.json()
+    assert created["icon"] == notifications.NOTIFICATION_TYPES["level_up"]["icon"]
+
+    listed = client.get("/api/notifications/astra").json()
+    assert [n["id"] for n in listed["notifications"]] == [created["id"]]
+    assert listed["notifications"][0]["data"] == {"level": 2}
+    assert listed["unread_count"] == 1
+
+    assert client.post(f"/api/notifications/{created['id']}/read", params={"character_name": "astra"}).status_code == 200
+    assert client.get("/api/notifications/astra").json()["unread_count"] == 0
+
+
+def test_bulk_create_and_mark_all_read(client):
+    entries = [
+        {"character_name": "astra", "type": "tip", "title": f"Tip {i}", "message": "..."}
+        for i in range(3)
+    ]
+
+    assert client.post("/api/notifications/bulk", json=entries).status_code == 200
+    assert client.get("/api/notifications/astra").json()["unread_count"] == 3
+
+    client.post("/api/notifications/astra/mark_all_read")
+    assert client.get("/api/notifications/astra", params={"unread_only": True}).json() == {
+        "notifications": [],
+        "unread_count": 0,
+    }
+
+
+def test_repeat_reads_are_served_from_the_inbox(monkeypatch, client):
+    notifications.create_notification("astra", "tip", "First", "...")
+
+    loads = []
+    get_inbox = NotificationDB.get_inbox
+    monkeypatch.setattr(NotificationDB, "get_inbox", lambda *args: loads.append(args) or get_inbox(*args))
+    client.get("/api/notifications/astra")
+    notifications.create_notification("astra", "tip", "Second", "...")
+    listed = client.get("/api/notifications/astra").json()
+
+    assert len(loads) == 1
+    assert [n["title"] for n in listed["notifications"]] == ["Second", "First"]
+    assert listed["unread_count"] == 2
+
+
+def test_pages_past_the_window_come_from_the_table(client):
+    extra = 5
+    notifications.create_notifications([
+        notifications.NotificationCreate(character_name="astra", type="tip", title=f"Tip {i}", message="...")
+        for i in range(notifications.MAX_NOTIFICATIONS_PER_CHARACTER + extra)
+    ])
+    client.get("/api/notifications/astra")
+
+    listed = client.get("/api/notifications/astra", params={"offset": 40, "limit": 20}).json()
+    assert len(listed["notifications"]) == notifications.MAX_NOTIFICATIONS_PER_CHARACTER + extra - 40
+    assert listed["unread_count"] == notifications.MAX_NOTIFICATIONS_PER_CHARACTER + extra
+
+
+def test_other_worker_writes_show_up_once_the_inbox_is_stale(monkeypatch, router_client):
+    monkeypatch.setattr(notifications, "notification_store", notifications.NotificationStore(ttl=0))
+    client = router_client(notifications.router, "/api/notifications")
+    client.get("/api/notifications/astra")
+
+    other = notifications._build_notification("astra", "tip", "Remote", "written elsewhere")
+    NotificationDB.add_many([other.model_dump()])
+    assert client.get("/api/notifications/astra").json()["unread_count"] == 1
+
+
+def run_with_publisher(monkeypatch, scenario):
+    monkeypatch.setattr(notifications, "NOTIFICATION_POLL_INTERVAL", 0.05)
+    monkeypatch.setitem(notifications._publisher_state, "seq", None)
+
+    async def main():
+        monkeypatch.setattr(notifications, "_notification_wakeup", asyncio.Event())
+        publisher = asyncio.ensure_future(notifications.notification_stream_loop())
+        try:
+            await scenario()
+        finally:
+            publisher.cancel()
+
+    asyncio.run(main())
+
+
+def test_idle_publisher_does_not_query(monkeypatch):
+    queries = []
+    monkeypatch.setattr(NotificationDB, "last_seq", lambda: queries.append("last_seq") or 0)
+    monkeypatch.setattr(NotificationDB, "get_since", lambda *args, **kwargs: queries.append("get_since") or [])
+
+    run_with_publisher(monkeypatch, lambda: asyncio.sleep(0.2))
+    assert queries == []
+
+
+def test_stream_receives_local_and_other_worker_writes(monkeypatch):
+    async def scenario():
+        events = notifications._notification_events("astra", None)
+        assert (await events.__anext__()).startswith("retry:")
+
+        pending = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.01)
+        notifications.create_notification("astra", "tip", "Local", "written here")
+        assert '"title": "Local"' in await asyncio.wait_for(pending, 1)
+
+        pending = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.01)
+        # Another worker's write doesn't set this worker's wakeup event; the poll finds it
+        other = notifications._build_notification("astra", "tip", "Remote", "written elsewhere")
+        NotificationDB.add_many([other.model_dump()])
+        assert '"title": "Remote"' in await asyncio.wait_for(pending, 1)
+        await events.aclose()
+
+    run_with_publisher(monkeypatch, scenario)
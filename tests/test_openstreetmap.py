@@ -0,0 +1,48 @@
+import httpx
+import pytest
+
+from routers import openstreetmap
+
+REVERSE_RESULT = {"place_id": 7, "lat": "48.8584", "lon": "2.2945", "display_name": "Eiffel Tower", "address": {}}
+
+
+@pytest.fixture
+def client(router_client):
+    return router_client(openstreetmap.router, "/api/osm", lambda request: httpx.Response(200, json=REVERSE_RESULT))
+
+
+def test_popular_places_are_served_with_validators(client):
+    response = client.get("/api/osm/places/popular")
+    assert response.status_code == 200
+    assert len(response.json()["places"]) == len(openstreetmap.POPULAR_PLACES)
+
+    cached = client.get("/api/osm/places/popular", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+
+def test_autocomplete_and_nearby_use_curated_places(client):
+    suggestions = client.get("/api/osm/autocomplete", params={"q": "eif"}).json()["suggestions"]
+    assert suggestions[0]["name"] == "Eiffel Tower"
+
+    places = client.get("/api/osm/places/nearby", params={"lat": 48.85, "lon": 2.29, "limit": 2}).json()["places"]
+    assert places[0]["name"] == "Eiffel Tower"
+    assert places[0]["distance_km"] < 5
+
+
+def test_reverse_responses_always_carry_cache_flags(client):
+    params = {"lat": 48.8584, "lon": 2.2945}
+
+    miss = client.get("/api/osm/reverse", params=params).json()
+    assert miss["display_name"] == "Eiffel Tower"
+    assert (miss["cached"], miss["approximate"], miss["stale"]) == (False, False, False)
+
+    hit = client.get("/api/osm/reverse", params=params).json()
+    assert (hit["cached"], hit["approximate"], hit["stale"]) == (True, False, False)
+
+
+def test_unparseable_search_answer_keeps_the_error_shape(router_client):
+    client = router_client(openstreetmap.router, "/api/osm", lambda request: httpx.Response(200, text="<html>"))
+
+    response = client.get("/api/osm/search", params={"q": "zzyzx nowhere"})
+    assert response.status_code == 200
+    assert "error" in response.json()
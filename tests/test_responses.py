@@ -0,0 +1,26 @@
+import pytest
+from fastapi import APIRouter, Request
+
+from responses import register_static
+
+POLICY = register_static("test_policy", {"rules": ["be kind"]})
+
+router = APIRouter()
+
+
+@router.get("/policy")
+async def get_policy(request: Request):
+    return POLICY(request)
+
+
+@pytest.fixture
+def client(router_client):
+    return router_client(router)
+
+
+def test_if_none_match_forms(client):
+    etag = client.get("/policy").headers["etag"]
+
+    for header in (etag, f'"other", {etag}', f"W/{etag}", "*"):
+        assert client.get("/policy", headers={"If-None-Match": header}).status_code == 304
+    assert client.get("/policy", headers={"If-None-Match": '"other"'}).status_code == 200